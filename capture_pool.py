@@ -0,0 +1,127 @@
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+import cv2
+
+# --- Capture Pool ---
+# Keeps cv2.VideoCapture handles open between uses, keyed by file path, so the
+# preview, thumbnails and export don't reopen (and re-probe) the container every
+# time they come back to a file. That is most of the cost of switching clips on
+# network storage. A consumer checks a handle out for exclusive use and checks it
+# back in when done; idle handles beyond the open-handle limit are released,
+# least recently used first.
+#
+# A handle checked back in keeps its read position: consumers ask the capture
+# for CAP_PROP_POS_FRAMES (or seek) rather than assuming a fresh handle starts
+# at frame 0. Handles are dropped if the file's size or mtime changed since the
+# handle was opened.
+
+DEFAULT_MAX_OPEN_CAPTURES = 16
+
+
+class CapturePool:
+    """Thread-safe pool of open VideoCapture handles with checkout/checkin and LRU eviction."""
+
+    def __init__(self, max_open=DEFAULT_MAX_OPEN_CAPTURES):
+        self.max_open = max_open
+        self.opened = 0 # Handles opened by the pool, for reuse statistics
+        self.reused = 0
+        self._idle = OrderedDict() # id(cap) -> (video_path, signature, cap), least recently used first
+        self._checked_out = {} # id(cap) -> (video_path, signature)
+        self._lock = threading.Lock()
+
+    def checkout(self, video_path):
+        """Return an open capture of video_path for exclusive use, reusing an idle one if possible.
+
+        The capture may not be opened (check isOpened()); check it in regardless.
+        """
+        signature = self._signature(video_path)
+        stale = []
+        cap = None
+        with self._lock:
+            for cap_id, (idle_path, idle_signature, idle_cap) in reversed(list(self._idle.items())):
+                if idle_path != video_path:
+                    continue
+                del self._idle[cap_id]
+                if idle_signature == signature:
+                    cap = idle_cap
+                    self.reused += 1
+                    break
+                stale.append(idle_cap) # The file changed since this handle was opened
+        for stale_cap in stale:
+            stale_cap.release()
+
+        if cap is None:
+            cap = cv2.VideoCapture(video_path)
+            with self._lock:
+                self.opened += 1
+        with self._lock:
+            self._checked_out[id(cap)] = (video_path, signature)
+            released = self._evict()
+        for evicted_cap in released:
+            evicted_cap.release()
+        return cap
+
+    def checkin(self, cap):
+        """Return a capture from checkout() to the pool. Captures that failed to open are released."""
+        with self._lock:
+            video_path, signature = self._checked_out.pop(id(cap), (None, None))
+            if video_path is None or not cap.isOpened():
+                released = [cap]
+            else:
+                self._idle[id(cap)] = (video_path, signature, cap)
+                released = self._evict()
+        for released_cap in released:
+            released_cap.release()
+
+    @contextmanager
+    def capture(self, video_path):
+        """Context manager that checks a capture out for the duration of the block."""
+        cap = self.checkout(video_path)
+        try:
+            yield cap
+        finally:
+            self.checkin(cap)
+
+    def discard(self, video_path):
+        """Release the idle handles of a file, e.g. before deleting it."""
+        with self._lock:
+            released = [cap for cap_id, (idle_path, _, cap) in list(self._idle.items()) if idle_path == video_path]
+            for cap in released:
+                del self._idle[id(cap)]
+        for cap in released:
+            cap.release()
+
+    def clear(self):
+        """Release every idle handle."""
+        with self._lock:
+            released = [cap for _, _, cap in self._idle.values()]
+            self._idle.clear()
+        for cap in released:
+            cap.release()
+
+    def _evict(self):
+        """Take least recently used idle handles out while too many are open. Callers hold the lock.
+
+        Returns the handles to release; they are released outside the lock, as
+        closing a file on network storage can be slow. Checked out handles are
+        never evicted, so the limit can be exceeded while they are all in use.
+        """
+        released = []
+        while self._idle and len(self._idle) + len(self._checked_out) > self.max_open:
+            _, (_, _, cap) = self._idle.popitem(last=False)
+            released.append(cap)
+        return released
+
+    @staticmethod
+    def _signature(video_path):
+        """Return (size, mtime) of a file, or None if it doesn't exist."""
+        try:
+            stat = os.stat(video_path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+
+shared_capture_pool = CapturePool() # Shared by the preview, thumbnails and export in this process
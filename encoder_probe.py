@@ -0,0 +1,191 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import cv2
+import numpy as np
+
+from export_engine import DEFAULT_FOURCC
+from media_probe import fourcc_to_string
+
+# --- Encoder Probe ---
+# Which fourccs an OpenCV build can write, and how fast, differs between build
+# images. The probe encodes a short synthetic clip with every candidate fourcc,
+# timing the encode and measuring the quality (PSNR) of what decodes back, and
+# caches the results per user for this OpenCV build and container. Export then
+# defaults to the fastest encoder that meets the chosen quality tier.
+#
+# A container only accepts some codec tags: in .mp4, OpenCV writes XVID, DIVX
+# and FMP4 as mp4v, and MJPG as mp4v too, after warning that the tag is
+# unsupported. Containers listed in CONTAINER_FOURCCS are only probed with their
+# native tags, so the encoder export picks never makes it warn. Other
+# containers try every candidate. Several tags can still be the same codec
+# (XVID, DIVX and FMP4 in .avi), so the probe reads the codec actually written
+# back from each test file and keeps one entry per codec: the first candidate
+# that wrote it.
+
+CANDIDATE_FOURCCS = ('mp4v', 'avc1', 'H264', 'hev1', 'XVID', 'DIVX', 'FMP4', 'MJPG', 'VP80', 'VP90')
+CONTAINER_FOURCCS = {
+    '.mp4': ('mp4v', 'avc1', 'hev1', 'vp09'),
+    '.m4v': ('mp4v', 'avc1', 'hev1', 'vp09'),
+    '.mov': ('mp4v', 'avc1', 'hev1', 'jpeg'),
+    '.avi': ('XVID', 'DIVX', 'FMP4', 'MJPG', 'H264'),
+}
+QUALITY_TIERS = {'draft': 28.0, 'standard': 33.0, 'high': 35.5} # Minimum PSNR in dB
+DEFAULT_QUALITY = 'standard'
+ENCODER_PROBE_FILE_NAME = "encoder_probe.json"
+PROBE_FORMAT_VERSION = 3 # 3: only the container's native tags
+PROBE_FRAME_SIZE = (640, 360)
+PROBE_FRAME_COUNT = 48
+PROBE_TIME_LIMIT = 2.0 # Seconds per encoder; very slow encoders are timed on fewer frames
+
+_probe_lock = threading.Lock() # One probe at a time when several exports start together
+
+
+def user_cache_dir():
+    """Return the per-user cache folder for the editor."""
+    if sys.platform == "win32":
+        base_dir = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base_dir, "simple_video_editor")
+
+
+def default_probe_path():
+    """Return the path of the per-user encoder probe cache."""
+    return os.path.join(user_cache_dir(), ENCODER_PROBE_FILE_NAME)
+
+
+def build_key(extension):
+    """Return the cache key for this OpenCV build writing the given container."""
+    build_hash = hashlib.sha1(cv2.getBuildInformation().encode("utf-8")).hexdigest()[:12]
+    return f"{cv2.__version__}-{build_hash}-{extension.lower()}"
+
+
+def synthetic_frames(size=PROBE_FRAME_SIZE, count=PROBE_FRAME_COUNT):
+    """Return moving gradient frames with sharp shapes and text, a rough stand-in for real footage."""
+    width, height = size
+    rows, columns = np.mgrid[0:height, 0:width]
+    frames = []
+    for index in range(count):
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[..., 0] = (columns + index * 4) % 256
+        frame[..., 1] = (rows * 0.7) % 256
+        frame[..., 2] = ((columns + rows) // 3 + index * 2) % 256
+        cv2.circle(frame, (width // 6 + index * 8, height // 2), height // 7, (255, 255, 255), -1)
+        cv2.putText(frame, f"PROBE {index}", (width // 3, height // 4), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 0, 0), 3)
+        frames.append(frame)
+    return frames
+
+
+def benchmark_fourcc(fourcc, frames, path, fps=30):
+    """Encode frames with one fourcc. Returns {'fourcc', 'written', 'fps', 'psnr', 'bytes_per_frame'}, or None if it doesn't work.
+
+    'written' is the fourcc OpenCV reports for the codec the file actually contains.
+    """
+    height, width = frames[0].shape[:2]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height))
+    if not writer.isOpened():
+        return None
+    frames_written = 0
+    start_time = time.perf_counter()
+    try:
+        for frame in frames:
+            writer.write(frame)
+            frames_written += 1
+            if time.perf_counter() - start_time > PROBE_TIME_LIMIT:
+                break
+    finally:
+        writer.release() # Flushing is part of the encode cost
+    encode_seconds = time.perf_counter() - start_time
+
+    # Decode it back: an encoder whose files OpenCV can't read is no use for export
+    cap = cv2.VideoCapture(path)
+    psnr_values = []
+    written_fourcc = fourcc_to_string(cap.get(cv2.CAP_PROP_FOURCC)) if cap.isOpened() else ""
+    try:
+        for frame in frames[:frames_written]:
+            ret, decoded = cap.read()
+            if not ret or decoded.shape != frame.shape:
+                break
+            psnr_values.append(cv2.PSNR(frame, decoded))
+    finally:
+        cap.release()
+    if not psnr_values or not os.path.exists(path):
+        return None
+    return {'fourcc': fourcc, 'written': written_fourcc or fourcc,
+            'fps': frames_written / encode_seconds if encode_seconds > 0 else 0.0,
+            'psnr': float(np.mean(psnr_values)), 'bytes_per_frame': os.path.getsize(path) // frames_written}
+
+
+def _load_probe_file(probe_path):
+    """Read the probe cache, returning an empty one if it is missing or unreadable."""
+    try:
+        with open(probe_path, "r", encoding="utf-8") as probe_file:
+            probe_data = json.load(probe_file)
+        if probe_data.get('version') == PROBE_FORMAT_VERSION:
+            return probe_data
+    except (OSError, ValueError):
+        pass
+    return {'version': PROBE_FORMAT_VERSION, 'builds': {}}
+
+
+def candidate_fourccs(extension):
+    """Return the fourccs to probe for a container: its native tags if known, else every candidate."""
+    return CONTAINER_FOURCCS.get(extension.lower(), CANDIDATE_FOURCCS)
+
+
+def probe_encoders(extension=".mp4", refresh=False, probe_path=None):
+    """Return the benchmark results for this build and container, fastest first, probing once if needed."""
+    probe_path = probe_path or default_probe_path()
+    key = build_key(extension)
+    with _probe_lock:
+        probe_data = _load_probe_file(probe_path)
+        if not refresh and key in probe_data['builds']:
+            return probe_data['builds'][key]['encoders']
+
+        print(f"Benchmarking video encoders for {extension} files (one-time)...")
+        frames = synthetic_frames()
+        work_dir = tempfile.mkdtemp(prefix="encoder_probe_")
+        try:
+            by_codec = {} # written fourcc -> result of the first candidate that wrote it
+            for fourcc in candidate_fourccs(extension):
+                result = benchmark_fourcc(fourcc, frames, os.path.join(work_dir, f"probe_{fourcc}{extension}"))
+                if result is None:
+                    continue
+                # Aliases of one codec differ only by timing noise
+                by_codec.setdefault(result['written'].lower(), result)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        results = sorted(by_codec.values(), key=lambda result: result['fps'], reverse=True)
+
+        # Re-read so results another process wrote meanwhile (other builds/containers) are kept
+        probe_data = _load_probe_file(probe_path)
+        probe_data['builds'][key] = {'measured_at': time.time(), 'encoders': results}
+        os.makedirs(os.path.dirname(probe_path), exist_ok=True)
+        temp_path = probe_path + f".{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as probe_file:
+            json.dump(probe_data, probe_file, indent=2)
+        os.replace(temp_path, probe_path)
+        return results
+
+
+def select_fourcc(output_path, quality=DEFAULT_QUALITY, probe_path=None):
+    """Return the fastest fourcc meeting the quality tier for output_path's container.
+
+    Falls back to the highest quality encoder if none meets the tier, and to
+    DEFAULT_FOURCC if the probe found no working encoder.
+    """
+    extension = os.path.splitext(output_path)[1] or ".mp4"
+    results = probe_encoders(extension, probe_path=probe_path)
+    if not results:
+        return DEFAULT_FOURCC
+    minimum_psnr = QUALITY_TIERS.get(quality, QUALITY_TIERS[DEFAULT_QUALITY])
+    for result in results: # Fastest first
+        if result['psnr'] >= minimum_psnr:
+            return result['fourcc']
+    return max(results, key=lambda result: result['psnr'])['fourcc']
@@ -0,0 +1,933 @@
+import os
+import json
+import math
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+import numpy as np
+
+from capture_pool import shared_capture_pool
+from timeline_model import (clip_source_range, clip_frame_total, clip_duration, is_video_clip,
+                            clip_layer, clip_opacity, timeline_duration)
+
+# --- Export Engine ---
+# Renders timeline clip data to a video file without touching the GUI.
+# The work is split into decode -> conform -> encode stages connected by bounded
+# queues, so reading, resizing and writing of different frames overlap and the
+# conform stage can use several cores. OpenCV releases the GIL inside read(),
+# resize() and write(), which is what lets plain threads scale here.
+#
+# Clips on stacked video tracks are composited per output frame. The timeline is
+# first cut into render sections, runs of frames in which the same clips are
+# visible, so the decoder only keeps open the clips a section actually shows.
+# Gaps between clips are exported as black frames that are never decoded.
+
+DEFAULT_FOURCC = 'mp4v' # Or 'XVID', 'MJPG'
+
+
+class ExportError(Exception):
+    """Raised when an export cannot be started or fails while rendering."""
+
+
+def default_conform_workers():
+    """Return a sensible conform worker count for this machine."""
+    # Leave one core each for the decode and encode stages
+    return max(1, (os.cpu_count() or 1) - 2)
+
+
+def probe_export_settings(sorted_clips, fourcc=DEFAULT_FOURCC):
+    """Return output settings (frame size, fps, fourcc) taken from the first readable clip."""
+    first_valid_clip_data = None
+    for clip_data in sorted_clips:
+        clip_path = clip_data.get('video_path')
+        if is_video_clip(clip_data) and clip_path and os.path.exists(clip_path):
+            first_valid_clip_data = clip_data
+            break
+
+    if not first_valid_clip_data:
+        raise ExportError("No valid video files found in timeline clips.")
+
+    with shared_capture_pool.capture(first_valid_clip_data['video_path']) as first_clip_cap:
+        if not first_clip_cap.isOpened():
+            raise ExportError(f"Could not open the first clip for export: {os.path.basename(first_valid_clip_data['video_path'])}")
+
+        frame_width = int(first_clip_cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        frame_height = int(first_clip_cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = first_clip_cap.get(cv2.CAP_PROP_FPS)
+
+    if fps == 0:
+        raise ExportError("Cannot determine frame rate from the first clip.")
+
+    return {'width': frame_width, 'height': frame_height, 'fps': fps, 'fourcc': fourcc}
+
+
+def open_video_writer(output_path, settings):
+    """Create a cv2.VideoWriter for the given export settings."""
+    fourcc = cv2.VideoWriter_fourcc(*settings['fourcc'])
+    out = cv2.VideoWriter(output_path, fourcc, settings['fps'], (settings['width'], settings['height']))
+    if not out.isOpened():
+        raise ExportError("Could not initialize video writer. Check codec availability or file path permissions.")
+    return out
+
+
+# --- Render Sections ---
+# A section is {'start_frame', 'frames', 'layers'}, where layers run bottom to top
+# and each is {'clip', 'opacity', 'start_frame' (the clip's first timeline frame),
+# 'source_in', 'source_out', 'source_fps'}. Frames are counted in the output
+# timebase from the start of the timeline. Sections cover the timeline without
+# holes: a gap is a section with no layers.
+#
+# Clips keep their real duration whatever their frame rate: each output frame
+# shows the source frame at the same point in time, so a 60 fps source in a
+# 30 fps export uses every other frame and a 24 fps source repeats some frames.
+
+SEEK_AHEAD_FRAMES = 48 # Further than this, seeking beats grabbing through the frames in between
+
+
+def clip_timeline_frames(clip_data, fps):
+    """Return the (start, end) output frames a clip covers on the timeline, end exclusive."""
+    start_frame = int(round(clip_data.get('start_time', 0) * fps))
+    return start_frame, start_frame + int(round(clip_duration(clip_data) * fps))
+
+
+def layer_source_frame(layer, frame, fps):
+    """Return the source frame a layer shows at output frame `frame`."""
+    # The small epsilon keeps exact ratios (e.g. 60 -> 30 fps) from rounding down a frame
+    offset = int(math.floor((frame - layer['start_frame']) * layer['source_fps'] / fps + 1e-6))
+    return min(layer['source_in'] + offset, layer['source_out'] - 1)
+
+
+def build_render_sections(sorted_clips, fps, duration=None):
+    """Cut the timeline into sections in which the same clips are visible.
+
+    The sections run from time 0 to duration seconds, which defaults to the end
+    of the last clip on the timeline.
+    """
+    entries = []
+    for clip_data in sorted_clips:
+        if not is_video_clip(clip_data):
+            continue
+        video_path = clip_data.get('video_path')
+        if not video_path or not os.path.exists(video_path):
+            print(f"Warning: Skipping missing clip file during export: {os.path.basename(video_path if video_path else 'N/A')}")
+            continue
+        start_frame, end_frame = clip_timeline_frames(clip_data, fps)
+        if end_frame > start_frame and clip_frame_total(clip_data) > 0:
+            entries.append((start_frame, end_frame, clip_data))
+
+    if duration is None:
+        end_of_timeline = max([int(round(timeline_duration(sorted_clips) * fps))] + [entry[1] for entry in entries])
+    else:
+        end_of_timeline = int(round(duration * fps))
+    boundaries = sorted({0, end_of_timeline} | {frame for start_frame, end_frame, _ in entries
+                                                 for frame in (start_frame, end_frame) if frame < end_of_timeline})
+    sections = []
+    for section_start, section_end in zip(boundaries, boundaries[1:]):
+        # Sorting is stable, so on one track the clip starting later ends up on top
+        visible = sorted((entry for entry in entries if entry[0] <= section_start and entry[1] >= section_end),
+                         key=lambda entry: clip_layer(entry[2]))
+        # Layers under a fully opaque clip never show, so they are never decoded
+        for index in range(len(visible) - 1, -1, -1):
+            if clip_opacity(visible[index][2]) >= 1.0:
+                visible = visible[index:]
+                break
+
+        layers = []
+        for start_frame, _, clip_data in visible:
+            source_in, source_out = clip_source_range(clip_data)
+            layers.append({'clip': clip_data, 'opacity': clip_opacity(clip_data), 'start_frame': start_frame,
+                           'source_in': source_in, 'source_out': source_out,
+                           'source_fps': clip_data.get('fps') or fps})
+        previous = sections[-1] if sections else None
+        if (previous and previous['start_frame'] + previous['frames'] == section_start
+                and [layer['clip'] for layer in previous['layers']] == [layer['clip'] for layer in layers]):
+            # Same clips as the section before (e.g. a cut hidden under an opaque layer, or more gap): extend it
+            previous['frames'] += section_end - section_start
+        else:
+            sections.append({'start_frame': section_start, 'frames': section_end - section_start, 'layers': layers})
+    return sections
+
+
+def crop_sections(sections, first_frame, end_frame):
+    """Return the parts of the sections within output frames [first_frame, end_frame)."""
+    cropped = []
+    for section in sections:
+        crop_start = max(first_frame, section['start_frame'])
+        crop_end = min(end_frame, section['start_frame'] + section['frames'])
+        if crop_start < crop_end:
+            cropped.append(dict(section, start_frame=crop_start, frames=crop_end - crop_start))
+    return cropped
+
+
+def sections_frame_total(sections):
+    """Return the number of output frames the sections render to."""
+    return sum(section['frames'] for section in sections)
+
+
+def clips_in_frame_range(sorted_clips, first_frame, end_frame, fps):
+    """Return the video clips visible anywhere in output frames [first_frame, end_frame)."""
+    range_clips = []
+    for clip_data in sorted_clips:
+        start_frame, clip_end_frame = clip_timeline_frames(clip_data, fps)
+        if is_video_clip(clip_data) and start_frame < end_frame and clip_end_frame > first_frame:
+            range_clips.append(clip_data)
+    return range_clips
+
+
+# --- Export Targets ---
+# An export can feed several outputs from one decode pass. Each target is a dict:
+#   {'kind': 'video', 'path', 'width', 'height', 'fps', 'fourcc'}
+#   {'kind': 'images', 'path' (folder), 'every_n', 'width' (optional), 'contact_sheet' (optional path)}
+#   {'kind': 'segments', 'path' (folder), 'segment_frames', 'width', 'height', 'fourcc', 'extension'}
+# Video targets may use a lower or higher fps than the master; frames are dropped
+# or repeated to match. Segment targets always use the master fps.
+
+SEGMENT_MANIFEST_FILE_NAME = "manifest.json"
+SEGMENT_PLAYLIST_FILE_NAME = "playlist.m3u8"
+DEFAULT_STREAM_SEGMENT_SECONDS = 4
+
+def video_target(output_path, settings):
+    """Return a video export target for the given settings."""
+    return {'kind': 'video', 'path': output_path, 'width': settings['width'], 'height': settings['height'],
+            'fps': settings['fps'], 'fourcc': settings['fourcc']}
+
+
+def review_package_targets(output_path, settings, proxy_scale=0.5, thumbnail_every_seconds=10, thumbnail_width=320):
+    """Return targets for a full-res master, a low-res review copy and JPEG thumbnails with a contact sheet."""
+    base_path, extension = os.path.splitext(output_path)
+    proxy_settings = dict(settings)
+    # Even dimensions keep every codec happy
+    proxy_settings['width'] = max(2, int(settings['width'] * proxy_scale) // 2 * 2)
+    proxy_settings['height'] = max(2, int(settings['height'] * proxy_scale) // 2 * 2)
+    return [
+        video_target(output_path, settings),
+        video_target(f"{base_path}_proxy{extension or '.mp4'}", proxy_settings),
+        {'kind': 'images', 'path': f"{base_path}_thumbnails", 'width': thumbnail_width,
+         'every_n': max(1, int(round(settings['fps'] * thumbnail_every_seconds))),
+         'contact_sheet': f"{base_path}_contact_sheet.jpg"},
+    ]
+
+
+def segmented_target(output_dir, settings, segment_seconds=DEFAULT_STREAM_SEGMENT_SECONDS, extension=".mp4"):
+    """Return a target writing numbered segment files of segment_seconds each into output_dir."""
+    return {'kind': 'segments', 'path': output_dir, 'width': settings['width'], 'height': settings['height'],
+            'fourcc': settings['fourcc'], 'extension': extension,
+            'segment_frames': max(1, int(round(segment_seconds * settings['fps'])))}
+
+
+class VideoSink:
+    """Writes the master frame stream to a video file, resampling to the target fps."""
+
+    def __init__(self, target, master_fps):
+        self.path = target['path']
+        self.size = (target['width'], target['height'])
+        self.fps = target['fps']
+        self.master_fps = master_fps
+        self.writer = open_video_writer(self.path, target)
+        self._next_output_frame = 0
+
+    def wants(self, sequence):
+        """Return True if master frame `sequence` appears in this output."""
+        if self.fps >= self.master_fps:
+            return True
+        first_output_frame = math.ceil(sequence * self.fps / self.master_fps)
+        return math.floor(first_output_frame * self.master_fps / self.fps) == sequence
+
+    def write(self, sequence, frame):
+        """Write master frame `sequence` as many times as the output timebase needs (possibly zero)."""
+        while math.floor(self._next_output_frame * self.master_fps / self.fps) <= sequence:
+            self.writer.write(frame)
+            self._next_output_frame += 1
+
+    def close(self, complete=True):
+        """Release the writer."""
+        self.writer.release()
+
+
+class ImageSequenceSink:
+    """Writes every Nth master frame as a JPEG, optionally tiling them into a contact sheet."""
+
+    CONTACT_SHEET_COLUMNS = 6
+
+    def __init__(self, target, master_size):
+        self.path = target['path']
+        self.every_n = max(1, int(target.get('every_n', 1)))
+        width = int(target.get('width') or master_size[0])
+        height = int(target.get('height') or round(master_size[1] * width / master_size[0]))
+        self.size = (width, height)
+        self.contact_sheet_path = target.get('contact_sheet')
+        self._thumbnails = []
+        os.makedirs(self.path, exist_ok=True)
+
+    def wants(self, sequence):
+        """Return True if master frame `sequence` is written as an image."""
+        return sequence % self.every_n == 0
+
+    def write(self, sequence, frame):
+        """Write the frame as a JPEG if it is one of the selected frames."""
+        if not self.wants(sequence):
+            return
+        cv2.imwrite(os.path.join(self.path, f"frame_{sequence:08d}.jpg"), frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        if self.contact_sheet_path:
+            # Frames may live in reused composite buffers, so keep a copy
+            self._thumbnails.append(frame.copy())
+
+    def close(self, complete=True):
+        """Write the contact sheet, if one was requested and the export finished."""
+        if not complete or not self.contact_sheet_path or not self._thumbnails:
+            return
+        columns = self.CONTACT_SHEET_COLUMNS
+        blank = self._thumbnails[0] * 0
+        rows = []
+        for row_start in range(0, len(self._thumbnails), columns):
+            row = self._thumbnails[row_start:row_start + columns]
+            row += [blank] * (columns - len(row))
+            rows.append(cv2.hconcat(row))
+        cv2.imwrite(self.contact_sheet_path, cv2.vconcat(rows), [cv2.IMWRITE_JPEG_QUALITY, 90])
+
+
+class SegmentedSink:
+    """Writes the master frame stream as numbered fixed-length segment files for progressive consumption.
+
+    Each time a segment is finished it is added to manifest.json and an HLS style
+    playlist.m3u8 in the output folder, so review tools can start playing or
+    copying the first segments while the rest of the timeline is still rendering.
+    A segment only appears in the manifest once its file is complete. The
+    playlist is closed with #EXT-X-ENDLIST when the export finishes.
+    """
+
+    def __init__(self, target, master_fps):
+        self.path = target['path']
+        self.size = (target['width'], target['height'])
+        self.fps = master_fps
+        self.segment_frames = max(1, int(target['segment_frames']))
+        self.extension = target.get('extension', ".mp4")
+        self._writer_settings = {'width': target['width'], 'height': target['height'], 'fps': master_fps,
+                                 'fourcc': target['fourcc']}
+        self._writer = None
+        self._segment_first_frame = 0
+        self._segment_frame_count = 0
+        self._segments = [] # Finished segments: {'file', 'first_frame', 'frames', 'start_time', 'duration'}
+        os.makedirs(self.path, exist_ok=True)
+        self._write_manifest(complete=False) # Consumers can start watching the folder right away
+
+    def wants(self, sequence):
+        """Every master frame goes into a segment."""
+        return True
+
+    def write(self, sequence, frame):
+        """Append the frame to the current segment, starting a new one when it is full."""
+        if self._writer is None:
+            self._segment_first_frame = sequence
+            self._segment_frame_count = 0
+            segment_path = os.path.join(self.path, self._segment_file_name(len(self._segments)))
+            self._writer = open_video_writer(segment_path, self._writer_settings)
+        self._writer.write(frame)
+        self._segment_frame_count += 1
+        if self._segment_frame_count >= self.segment_frames:
+            self._finish_segment()
+
+    def close(self, complete=True):
+        """Finish the last (possibly short) segment and mark the manifest complete if the export finished."""
+        self._finish_segment()
+        self._write_manifest(complete)
+
+    def _segment_file_name(self, index):
+        """Return the file name of segment `index`."""
+        return f"segment_{index:05d}{self.extension}"
+
+    def _finish_segment(self):
+        """Release the current segment's writer and publish it in the manifest."""
+        if self._writer is None:
+            return
+        self._writer.release()
+        self._writer = None
+        self._segments.append({'file': self._segment_file_name(len(self._segments)),
+                               'first_frame': self._segment_first_frame, 'frames': self._segment_frame_count,
+                               'start_time': self._segment_first_frame / self.fps,
+                               'duration': self._segment_frame_count / self.fps})
+        self._write_manifest(complete=False)
+
+    def _write_manifest(self, complete):
+        """Rewrite manifest.json and playlist.m3u8 atomically, so readers never see a half-written file."""
+        manifest = {'fps': self.fps, 'width': self.size[0], 'height': self.size[1],
+                    'segment_frames': self.segment_frames, 'complete': complete, 'segments': self._segments}
+        target_duration = max([segment['duration'] for segment in self._segments] + [self.segment_frames / self.fps])
+        playlist_lines = ["#EXTM3U", "#EXT-X-VERSION:3", f"#EXT-X-TARGETDURATION:{math.ceil(target_duration)}",
+                          "#EXT-X-MEDIA-SEQUENCE:0", "#EXT-X-PLAYLIST-TYPE:EVENT"]
+        for segment in self._segments:
+            playlist_lines += [f"#EXTINF:{segment['duration']:.3f},", segment['file']]
+        if complete:
+            playlist_lines.append("#EXT-X-ENDLIST")
+
+        for file_name, contents in ((SEGMENT_MANIFEST_FILE_NAME, json.dumps(manifest, indent=2)),
+                                    (SEGMENT_PLAYLIST_FILE_NAME, "\n".join(playlist_lines) + "\n")):
+            final_path = os.path.join(self.path, file_name)
+            with open(final_path + ".tmp", "w", encoding="utf-8") as manifest_file:
+                manifest_file.write(contents)
+            os.replace(final_path + ".tmp", final_path)
+
+
+def open_sink(target, settings):
+    """Create the sink for an export target."""
+    if target.get('kind', 'video') == 'images':
+        return ImageSequenceSink(target, (settings['width'], settings['height']))
+    if target['kind'] == 'segments':
+        return SegmentedSink(target, settings['fps'])
+    return VideoSink(target, settings['fps'])
+
+
+class ExportPipeline:
+    """Multi-threaded decode/conform/encode pipeline for exporting a list of clips to one or more targets."""
+
+    _STOP = object() # Sentinel passed down the queues when a stage is finished
+
+    def __init__(self, sorted_clips, output_path, settings, conform_workers=None, queue_size=32, targets=None,
+                 duration=None, frame_range=None):
+        self.sorted_clips = sorted_clips
+        self.output_path = output_path
+        self.settings = settings # Master settings: the fps here defines the frame stream fed to every target
+        self.conform_workers = conform_workers or default_conform_workers()
+        self.targets = targets or [video_target(output_path, settings)]
+        self.output_paths = [target['path'] for target in self.targets if target.get('kind', 'video') == 'video']
+        if frame_range is None:
+            self.sections = build_render_sections(sorted_clips, settings['fps'], duration)
+        else:
+            # Render only output frames [first, end) of the timeline (a segment or cache entry)
+            first_frame, end_frame = frame_range
+            self.sections = crop_sections(build_render_sections(sorted_clips, settings['fps'], end_frame / settings['fps']),
+                                          first_frame, end_frame)
+        self.master_size = (settings['width'], settings['height'])
+        self._gap_frames = {} # Output size -> the one black frame every gap frame at that size reuses
+
+        # Bounded queues keep memory flat: the decoder can only run queue_size frames ahead
+        self._decode_queue = queue.Queue(maxsize=queue_size)
+        self._encode_queue = queue.Queue(maxsize=queue_size)
+        self._abort = threading.Event()
+        self._threads = []
+        self._sinks = []
+        # Composite buffers handed back by the encode stage once written, so
+        # multi-layer frames don't allocate a new image each time
+        self._free_buffers = queue.SimpleQueue()
+
+        self.error = None # First exception raised by any stage
+        self.cancelled = False
+        self.frames_written = 0
+        self.total_frames = sections_frame_total(self.sections)
+        self.progress_callback = None
+        self.clip_stats = [] # Per-clip decode throughput: {'video_path', 'frames', 'skipped', 'seconds'}
+
+    def start(self, progress_callback=None):
+        """Open the outputs and start all pipeline stages in background threads."""
+        self.progress_callback = progress_callback
+        try:
+            for target in self.targets:
+                self._sinks.append(open_sink(target, self.settings))
+        except Exception:
+            self._close_sinks(complete=False)
+            raise
+        for sink in self._sinks:
+            if sink.size not in self._gap_frames:
+                self._gap_frames[sink.size] = np.zeros((sink.size[1], sink.size[0], 3), dtype=np.uint8)
+
+        self._threads = [threading.Thread(target=self._decode_stage, name="export-decode", daemon=True)]
+        for i in range(self.conform_workers):
+            self._threads.append(threading.Thread(target=self._conform_stage, name=f"export-conform-{i}", daemon=True))
+        self._threads.append(threading.Thread(target=self._encode_stage, name="export-encode", daemon=True))
+
+        for thread in self._threads:
+            thread.start()
+
+    def wait(self, timeout=None):
+        """Wait for the encode stage to finish. Returns True once the export is done."""
+        encode_thread = self._threads[-1]
+        encode_thread.join(timeout)
+        return not encode_thread.is_alive()
+
+    def run(self, progress_callback=None):
+        """Run the export to completion in the calling thread's context."""
+        self.start(progress_callback)
+        self.wait()
+        if self.error is not None:
+            raise ExportError(f"Failed to export timeline: {self.error}") from self.error
+
+    def cancel(self):
+        """Request the pipeline to stop as soon as possible."""
+        self.cancelled = True
+        self._abort.set()
+
+    def _fail(self, error):
+        """Record the first error and stop the other stages."""
+        if self.error is None:
+            self.error = error
+        self._abort.set()
+
+    def _put(self, q, item):
+        """Put an item on a bounded queue, giving up if the pipeline is aborted."""
+        while not self._abort.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        """Get an item from a queue, returning _STOP if the pipeline is aborted."""
+        while not self._abort.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return self._STOP
+
+    def _decode_stage(self):
+        """Read the visible layers of each section in order and hand them to the conform workers."""
+        sequence = 0
+        fps = self.settings['fps']
+        readers = {} # id(clip) -> {'cap', 'next_frame', 'last_frame', 'video_path', 'frames', 'skipped', 'seconds'}
+        try:
+            for section in self.sections:
+                if self._abort.is_set():
+                    break
+                if not section['layers']:
+                    # Gap: nothing to decode, the conform workers substitute black frames
+                    for reader in readers.values():
+                        self._close_reader(reader)
+                    readers = {}
+                    for _ in range(section['frames']):
+                        if not self._put(self._decode_queue, (sequence, None)):
+                            break
+                        sequence += 1
+                    continue
+
+                # Release clips this section no longer shows
+                section_clip_ids = {id(layer['clip']) for layer in section['layers']}
+                for clip_id in [clip_id for clip_id in readers if clip_id not in section_clip_ids]:
+                    self._close_reader(readers.pop(clip_id))
+                layer_readers = []
+                for layer in section['layers']:
+                    reader = readers.get(id(layer['clip']))
+                    if reader is None:
+                        reader = readers[id(layer['clip'])] = self._open_reader(layer['clip'])
+                    layer_readers.append((layer, reader))
+
+                for frame_index in range(section['start_frame'], section['start_frame'] + section['frames']):
+                    if self._abort.is_set():
+                        break
+                    layer_frames = []
+                    for layer, reader in layer_readers:
+                        if reader['cap'] is None:
+                            continue
+                        frame = self._read_source_frame(reader, layer_source_frame(layer, frame_index, fps))
+                        if frame is None:
+                            # Source shorter than its clip data says; drop the layer
+                            self._close_reader(reader)
+                            continue
+                        layer_frames.append((frame, layer['opacity']))
+                    # If every layer ran out the frame becomes a gap frame, so timing is kept
+                    if not self._put(self._decode_queue, (sequence, layer_frames or None)):
+                        break
+                    sequence += 1
+        except Exception as e:
+            self._fail(e)
+        finally:
+            for reader in readers.values():
+                self._close_reader(reader)
+            # One stop marker per conform worker
+            for _ in range(self.conform_workers):
+                if not self._put(self._decode_queue, self._STOP):
+                    break
+
+    def _read_source_frame(self, reader, source_frame):
+        """Return source frame `source_frame` of a reader's clip, or None if it can't be read.
+
+        Frames the output drops are only grab()bed, never retrieve()d (converted to
+        BGR), and a frame shown twice is decoded once. Trimmed material is skipped
+        with a seek, as are long jumps forward.
+        """
+        if source_frame == reader['next_frame'] - 1 and reader['last_frame'] is not None:
+            return reader['last_frame'] # Source slower than the output: repeat the frame
+        read_start = time.perf_counter()
+        try:
+            cap = reader['cap']
+            if (source_frame < reader['next_frame'] or source_frame > reader['next_frame'] + SEEK_AHEAD_FRAMES
+                    or (reader['last_frame'] is None and source_frame != reader['next_frame'])):
+                cap.set(cv2.CAP_PROP_POS_FRAMES, source_frame)
+                reader['next_frame'] = source_frame
+            while reader['next_frame'] < source_frame:
+                if not cap.grab():
+                    return None
+                reader['next_frame'] += 1
+                reader['skipped'] += 1
+            if not cap.grab():
+                return None
+            ret, frame = cap.retrieve()
+            if not ret:
+                return None
+            reader['next_frame'] += 1
+            reader['frames'] += 1
+            reader['last_frame'] = frame
+            return frame
+        finally:
+            reader['seconds'] += time.perf_counter() - read_start
+
+    def _open_reader(self, clip_data):
+        """Open a clip's source for decoding. A source that fails to open gets a reader without a capture."""
+        video_path = clip_data['video_path']
+        cap = shared_capture_pool.checkout(video_path)
+        if not cap.isOpened():
+            print(f"Warning: Could not open clip for reading during export: {os.path.basename(video_path)}")
+            shared_capture_pool.checkin(cap)
+            cap = None
+        # A pooled capture may be anywhere in the file: start from where it is
+        next_frame = int(cap.get(cv2.CAP_PROP_POS_FRAMES)) if cap is not None else 0
+        return {'cap': cap, 'next_frame': next_frame, 'last_frame': None, 'video_path': video_path,
+                'frames': 0, 'skipped': 0, 'seconds': 0.0}
+
+    def _close_reader(self, reader):
+        """Return a reader's capture to the pool and record its decode throughput (time inside grab()/retrieve() only)."""
+        if reader['cap'] is None:
+            return
+        shared_capture_pool.checkin(reader['cap'])
+        reader['cap'] = None
+        reader['last_frame'] = None
+        self.clip_stats.append({'video_path': reader['video_path'], 'frames': reader['frames'],
+                                'skipped': reader['skipped'], 'seconds': reader['seconds']})
+
+    def _conform_stage(self):
+        """Composite the layers of each frame, then resize it to every output size that needs it."""
+        scratch = None # Per-worker buffer for layers that need resizing before blending
+        try:
+            while True:
+                item = self._get(self._decode_queue)
+                if item is self._STOP:
+                    break
+                sequence, layer_frames = item
+                buffer = None
+                if layer_frames is None:
+                    # Gap frame: the preallocated black frames are already at every output size
+                    frames_by_size = {sink.size: self._gap_frames[sink.size] for sink in self._sinks if sink.wants(sequence)}
+                    if not self._put(self._encode_queue, (sequence, frames_by_size, None)):
+                        break
+                    continue
+                if len(layer_frames) == 1 and layer_frames[0][1] >= 1.0:
+                    # Single opaque layer: nothing to blend
+                    frame = layer_frames[0][0]
+                else:
+                    buffer = self._take_buffer()
+                    if scratch is None:
+                        scratch = np.empty_like(buffer)
+                    frame = self._composite(layer_frames, buffer, scratch)
+                # One resized copy per distinct output size, only for outputs that use this frame
+                frames_by_size = {}
+                for sink in self._sinks:
+                    if sink.size in frames_by_size or not sink.wants(sequence):
+                        continue
+                    if frame.shape[1] == sink.size[0] and frame.shape[0] == sink.size[1]:
+                        frames_by_size[sink.size] = frame
+                    elif sink.size[0] < frame.shape[1]:
+                        frames_by_size[sink.size] = cv2.resize(frame, sink.size, interpolation=cv2.INTER_AREA)
+                    else:
+                        frames_by_size[sink.size] = cv2.resize(frame, sink.size)
+                if not self._put(self._encode_queue, (sequence, frames_by_size, buffer)):
+                    break
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._put(self._encode_queue, self._STOP)
+
+    def _take_buffer(self):
+        """Return a free master-size composite buffer, allocating one if none is free."""
+        try:
+            return self._free_buffers.get_nowait()
+        except queue.Empty:
+            return np.empty((self.master_size[1], self.master_size[0], 3), dtype=np.uint8)
+
+    def _composite(self, layer_frames, out, scratch):
+        """Blend (frame, opacity) layers bottom to top into out, in place. Returns out."""
+        for index, (frame, opacity) in enumerate(layer_frames):
+            if frame.shape[1] != self.master_size[0] or frame.shape[0] != self.master_size[1]:
+                interpolation = cv2.INTER_AREA if frame.shape[1] > self.master_size[0] else cv2.INTER_LINEAR
+                frame = cv2.resize(frame, self.master_size, dst=scratch, interpolation=interpolation)
+            if opacity >= 1.0:
+                np.copyto(out, frame)
+            elif index == 0:
+                # Bottom layer blends over black
+                cv2.addWeighted(frame, opacity, frame, 0.0, 0.0, dst=out)
+            else:
+                cv2.addWeighted(frame, opacity, out, 1.0 - opacity, 0.0, dst=out)
+        return out
+
+    def _encode_stage(self):
+        """Feed conformed frames to the outputs in sequence order, reordering the output of parallel workers."""
+        pending = {} # Frames that arrived ahead of the next sequence number
+        next_sequence = 0
+        stopped_workers = 0
+        try:
+            while stopped_workers < self.conform_workers:
+                item = self._get(self._encode_queue)
+                if item is self._STOP:
+                    if self._abort.is_set():
+                        break
+                    stopped_workers += 1
+                    continue
+                sequence, frames_by_size, buffer = item
+                pending[sequence] = (frames_by_size, buffer)
+                while next_sequence in pending:
+                    frames_by_size, buffer = pending.pop(next_sequence)
+                    for sink in self._sinks:
+                        if sink.size in frames_by_size:
+                            sink.write(next_sequence, frames_by_size[sink.size])
+                    if buffer is not None:
+                        self._free_buffers.put(buffer)
+                    next_sequence += 1
+                    self.frames_written = next_sequence
+                    if self.progress_callback:
+                        self.progress_callback(self.frames_written, self.total_frames)
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._close_sinks(complete=not self._abort.is_set() and next_sequence == self.total_frames)
+
+    def _close_sinks(self, complete=True):
+        """Release every output, keeping the first error. complete is False for a cancelled or failed export."""
+        for sink in self._sinks:
+            try:
+                sink.close(complete)
+            except Exception as e:
+                self._fail(e)
+        self._sinks = []
+
+
+# --- Background Exports ---
+# Exports made of several steps (segments, checkpoints, cached sections) run on
+# one background thread of their own. They share the job interface the export
+# worker and queue drive: start/wait/run/cancel, frames_written out of
+# total_frames for progress, and the first error.
+
+class BackgroundExport:
+    """Base class for exports that do their work on a single background thread."""
+
+    thread_name = "export-background"
+
+    def __init__(self, sorted_clips, output_path, settings):
+        self.sorted_clips = sorted_clips
+        self.output_path = output_path
+        self.settings = settings
+
+        self.error = None
+        self.cancelled = False
+        self.frames_written = 0
+        self.total_frames = 0
+        self.progress_callback = None
+        self.clip_stats = []
+        self._thread = None
+
+    def start(self, progress_callback=None):
+        """Start the export in the background."""
+        self.progress_callback = progress_callback
+        self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout=None):
+        """Wait for the export to finish. Returns True once it is done."""
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def run(self, progress_callback=None):
+        """Run the export to completion."""
+        self.start(progress_callback)
+        self.wait()
+        if self.error is not None:
+            raise ExportError(f"Failed to export timeline: {self.error}") from self.error
+
+    def cancel(self):
+        """Request the export to stop."""
+        self.cancelled = True
+
+    def _run(self):
+        """Thread body: do the export, keeping the error unless it was cancelled."""
+        try:
+            self._export()
+        except Exception as e:
+            if not self.cancelled:
+                self.error = e
+
+    def _export(self):
+        """Do the export work. Implemented by subclasses."""
+        raise NotImplementedError
+
+    def _report_progress(self):
+        """Call the progress callback, if any."""
+        if self.progress_callback:
+            self.progress_callback(self.frames_written, self.total_frames)
+
+
+# --- Segment-Parallel Export ---
+# Long timelines are split into contiguous segments. Each segment is rendered by
+# its own process (own VideoCapture/VideoWriter), then the segment files are
+# stitched together. OpenCV's decode/encode is CPU bound per stream, so this is
+# what scales a single export with core count.
+
+def default_segment_processes():
+    """Return a sensible number of segment render processes for this machine."""
+    return max(1, os.cpu_count() or 1)
+
+
+def split_into_segments(sorted_clips, segment_count, fps, duration=None):
+    """Split the timeline into up to segment_count contiguous segments of similar frame count.
+
+    Each segment is {'clips', 'first_frame', 'frames'}: the clips visible in the
+    segment and the range of output frames it renders. A boundary may fall inside
+    a clip, so even a single long take is rendered in parallel.
+    """
+    sections = build_render_sections(sorted_clips, fps, duration)
+    total_frames = sections_frame_total(sections)
+    if total_frames == 0:
+        return []
+    segment_count = max(1, min(segment_count, total_frames))
+    target_frames = -(-total_frames // segment_count) # Ceiling division
+    segments = []
+    for first_frame in range(0, total_frames, target_frames):
+        end_frame = min(first_frame + target_frames, total_frames)
+        segments.append({'clips': clips_in_frame_range(sorted_clips, first_frame, end_frame, fps),
+                         'first_frame': first_frame, 'frames': end_frame - first_frame})
+    return segments
+
+
+def render_segment(segment, output_path, settings):
+    """Render one segment to its own file. Runs inside a worker process."""
+    frame_range = (segment['first_frame'], segment['first_frame'] + segment['frames'])
+    pipeline = ExportPipeline(segment['clips'], output_path, settings, conform_workers=1, frame_range=frame_range)
+    pipeline.run()
+    return pipeline.frames_written, pipeline.clip_stats
+
+
+def ffmpeg_path():
+    """Return the path of a locally installed ffmpeg binary, or None."""
+    return shutil.which("ffmpeg")
+
+
+def require_ffmpeg(export_kind):
+    """Raise ExportError if ffmpeg, which joins rendered segments, isn't installed."""
+    if not ffmpeg_path():
+        raise ExportError(f"{export_kind} needs ffmpeg on the PATH to join the rendered segments.")
+
+
+def concatenate_segments(segment_paths, output_path, settings):
+    """Join rendered segment files into the final output with ffmpeg's stream copy.
+
+    Re-encoding the segments instead would cost more than rendering the
+    timeline in one pass, so segmented exports require ffmpeg.
+    """
+    ffmpeg = ffmpeg_path()
+    if not ffmpeg:
+        raise ExportError("ffmpeg is needed to join export segments but was not found on the PATH.")
+    # Stream copy with the concat demuxer: no decode or re-encode
+    list_fd, list_path = tempfile.mkstemp(suffix=".txt", dir=os.path.dirname(segment_paths[0]))
+    try:
+        with os.fdopen(list_fd, "w") as list_file:
+            for path in segment_paths:
+                escaped_path = os.path.abspath(path).replace("'", "'\\''")
+                list_file.write(f"file '{escaped_path}'\n")
+        result = subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+                                 "-i", list_path, "-c", "copy", output_path],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise ExportError(f"ffmpeg could not join export segments: {result.stderr.strip()}")
+    finally:
+        os.remove(list_path)
+
+
+class ParallelExport(BackgroundExport):
+    """Segment-parallel export across a process pool, followed by concatenation.
+
+    Without ffmpeg the segments can't be joined cheaply, so the timeline is
+    rendered by a single in-process pipeline instead.
+    """
+
+    thread_name = "export-parallel"
+
+    def __init__(self, sorted_clips, output_path, settings, processes=None, duration=None):
+        super().__init__(sorted_clips, output_path, settings)
+        self.processes = processes or default_segment_processes()
+        self.duration = duration
+        self.segments = split_into_segments(sorted_clips, self.processes, settings['fps'], duration)
+        self.total_frames = sum(segment['frames'] for segment in self.segments)
+        self._executor = None
+        self._current_pipeline = None # The single pipeline used when ffmpeg is missing
+
+    def cancel(self):
+        """Stop submitting segments; segments already rendering are discarded."""
+        super().cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._current_pipeline is not None:
+            self._current_pipeline.cancel()
+
+    def _export_single_pass(self):
+        """Render the whole timeline in this process, for when there is no ffmpeg to join segments."""
+        print("ffmpeg not found: exporting in a single process instead of parallel segments.")
+        pipeline = ExportPipeline(self.sorted_clips, self.output_path, self.settings, duration=self.duration)
+        self._current_pipeline = pipeline
+        try:
+            if self.cancelled:
+                return
+            pipeline.start(lambda done, total: self._on_single_pass_progress(done))
+            pipeline.wait()
+        finally:
+            self._current_pipeline = None
+        self.clip_stats.extend(pipeline.clip_stats)
+        if pipeline.error is not None:
+            raise pipeline.error
+
+    def _on_single_pass_progress(self, frames_done):
+        """Forward the single pipeline's progress."""
+        self.frames_written = frames_done
+        self._report_progress()
+
+    def _export(self):
+        """Render all segments in worker processes and join them."""
+        if self.segments and not ffmpeg_path():
+            self._export_single_pass()
+            return
+        output_dir = os.path.dirname(os.path.abspath(self.output_path))
+        extension = os.path.splitext(self.output_path)[1] or ".mp4"
+        # Keep segments next to the output so the final join stays on the same disk
+        work_dir = tempfile.mkdtemp(prefix=".export_segments_", dir=output_dir)
+        try:
+            if not self.segments:
+                raise ExportError("No valid video files found in timeline clips.")
+            segment_paths = [os.path.join(work_dir, f"segment_{i:04d}{extension}") for i in range(len(self.segments))]
+            if self.cancelled:
+                return # Cancelled before the pool was started
+
+            # Spawn rather than fork: the parent may be a running Qt application
+            context = multiprocessing.get_context("spawn")
+            self._executor = ProcessPoolExecutor(max_workers=min(self.processes, len(self.segments)), mp_context=context)
+            try:
+                futures = {}
+                for segment, path in zip(self.segments, segment_paths):
+                    # cancel() may have run before the pool existed, so it couldn't shut it down
+                    if self.cancelled:
+                        break
+                    futures[self._executor.submit(render_segment, segment, path, self.settings)] = path
+                for future in as_completed(futures):
+                    frames_written, clip_stats = future.result()
+                    self.frames_written += frames_written
+                    self.clip_stats.extend(clip_stats)
+                    self._report_progress()
+            finally:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+
+            if not self.cancelled:
+                concatenate_segments(segment_paths, self.output_path, self.settings)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
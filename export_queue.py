@@ -0,0 +1,248 @@
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import threading
+from contextlib import contextmanager
+
+from export_engine import probe_export_settings
+from resumable_export import ResumableExport
+from encoder_probe import select_fourcc
+from timeline_model import load_timeline, save_timeline, sorted_timeline_clips
+
+# --- Export Queue ---
+# A list of export jobs persisted in the project folder. Jobs run concurrently
+# as long as their combined worker count fits in a CPU budget. A failed job is
+# put back at the end of the queue until it runs out of attempts, so it never
+# holds up the jobs behind it. Jobs render with checkpoints, so a retried or
+# interrupted job only renders the segments it had not finished.
+#
+# The GUI, `render_cli queue add` and a running `render_cli queue run` may all
+# use the queue file at once. Every change is a transaction under a lock file:
+# the job list is re-read from disk, changed and written back, so a job added by
+# another process while the queue runs is picked up rather than overwritten.
+#
+# Several runners may work through the same queue. A runner records its host
+# and pid on each job it starts and refreshes the job's heartbeat every poll;
+# another runner only takes a 'running' job over once that owner is gone (its
+# heartbeat went stale, or its process no longer exists on this host).
+
+EXPORT_QUEUE_FILE_NAME = "export_queue.json"
+EXPORT_QUEUE_DIR_NAME = "export_queue" # Timeline snapshots of queued jobs
+QUEUE_LOCK_STALE_SECONDS = 30.0 # A lock file older than this was left by a crashed process
+RUNNER_HEARTBEAT_STALE_SECONDS = 60.0 # A running job not heard from for this long has lost its runner
+
+
+def _process_exists(pid):
+    """Return whether a process with this pid exists on this machine (True where that can't be checked)."""
+    if sys.platform == "win32":
+        return True # os.kill would terminate it; rely on the heartbeat instead
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True # Exists, but belongs to another user
+    return True
+
+
+class ExportQueue:
+    """Persistent queue of timeline export jobs."""
+
+    def __init__(self, project_path, cpu_budget=None, max_attempts=3):
+        self.project_path = project_path
+        self.queue_path = os.path.join(project_path, EXPORT_QUEUE_FILE_NAME)
+        self.snapshot_dir = os.path.join(project_path, EXPORT_QUEUE_DIR_NAME)
+        self.cpu_budget = cpu_budget or os.cpu_count() or 1
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._jobs = self._load()
+
+    def _load(self):
+        """Read the job list from disk."""
+        if not os.path.exists(self.queue_path):
+            return []
+        with open(self.queue_path, "r", encoding="utf-8") as queue_file:
+            return json.load(queue_file).get('jobs', [])
+
+    def _save(self):
+        """Write the job list to disk. Callers hold both locks (see _transaction)."""
+        temp_path = self.queue_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as queue_file:
+            json.dump({'jobs': self._jobs}, queue_file, indent=2)
+        os.replace(temp_path, self.queue_path)
+
+    def _refresh(self, running_jobs=()):
+        """Replace the job list with the one on disk, updating the job dicts in place.
+
+        Job threads keep references to their job dicts, so known jobs are
+        updated rather than replaced. running_jobs are jobs this process is
+        rendering; they are kept even if they disappeared from the file.
+        """
+        known = {job['id']: job for job in self._jobs}
+        jobs = []
+        for disk_job in self._load():
+            job = known.get(disk_job['id'])
+            if job is None:
+                job = disk_job # Added by another process
+            else:
+                job.clear()
+                job.update(disk_job)
+            jobs.append(job)
+        listed = {job['id'] for job in jobs}
+        jobs.extend(job for job in running_jobs if job['id'] not in listed)
+        self._jobs = jobs
+
+    @contextmanager
+    def _file_lock(self):
+        """Hold the queue's lock file, so one process at a time reads, changes and writes the queue."""
+        lock_path = self.queue_path + ".lock"
+        os.makedirs(self.project_path, exist_ok=True)
+        while True:
+            try:
+                lock_fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > QUEUE_LOCK_STALE_SECONDS:
+                        os.remove(lock_path)
+                        continue
+                except OSError:
+                    continue # Released (or broken) in the meantime
+                time.sleep(0.02)
+        try:
+            yield
+        finally:
+            os.close(lock_fd)
+            os.remove(lock_path)
+
+    @contextmanager
+    def _transaction(self, running_jobs=()):
+        """Lock the queue, refresh the job list from disk, and write it back when the block ends."""
+        with self._lock, self._file_lock():
+            self._refresh(running_jobs)
+            yield
+            self._save()
+
+    def jobs(self):
+        """Return a copy of the job list as it is on disk."""
+        with self._lock:
+            self._refresh()
+            return [dict(job) for job in self._jobs]
+
+    def add_job(self, clips_data, output_path, workers=2):
+        """Queue an export of a snapshot of the given clips. Returns the new job."""
+        job_id = uuid.uuid4().hex[:12]
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        timeline_path = os.path.join(self.snapshot_dir, f"{job_id}.json")
+        # Snapshot the timeline so later edits don't change what this job renders
+        save_timeline(timeline_path, clips_data)
+        job = {
+            'id': job_id,
+            'timeline': timeline_path,
+            'output': output_path,
+            'workers': max(1, int(workers)),
+            'status': 'queued', # queued, running, done or failed
+            'runner': None, # {'host', 'pid'} of the runner rendering the job
+            'heartbeat': None, # When that runner last reported the job alive
+            'attempts': 0,
+            'error': None,
+            'frames': 0,
+            'seconds': 0.0,
+            'fps': 0.0,
+        }
+        with self._transaction():
+            self._jobs.append(job)
+        return dict(job)
+
+    def remove_finished(self):
+        """Drop done and failed jobs from the queue."""
+        with self._transaction():
+            self._jobs = [job for job in self._jobs if job['status'] not in ('done', 'failed')]
+
+    def _runner_gone(self, job):
+        """Return whether the runner that marked a job 'running' has stopped without finishing it."""
+        runner = job.get('runner')
+        heartbeat = job.get('heartbeat')
+        if not runner or heartbeat is None:
+            return True # Left by a runner that didn't record itself
+        if time.time() - heartbeat > RUNNER_HEARTBEAT_STALE_SECONDS:
+            return True
+        if runner['host'] == socket.gethostname() and runner['pid'] != os.getpid():
+            return not _process_exists(runner['pid'])
+        return False
+
+    def run(self, progress_callback=None, poll_interval=0.2):
+        """Run queued jobs until none are left. progress_callback(job) is called whenever a job changes."""
+        runner = {'host': socket.gethostname(), 'pid': os.getpid()}
+        running = {} # job id -> (job, thread)
+        while True:
+            # Re-read every poll, so jobs queued by other processes meanwhile run too
+            with self._transaction([job for job, _ in running.values()]):
+                for job_id in [job_id for job_id, (_, thread) in running.items() if not thread.is_alive()]:
+                    del running[job_id]
+                now = time.time()
+                for job in self._jobs:
+                    if job['id'] in running:
+                        job['heartbeat'] = now
+                    elif job['status'] == 'running' and self._runner_gone(job):
+                        # Its runner was interrupted: start it over (finished checkpoints are kept)
+                        job['status'] = 'queued'
+                queued = [job for job in self._jobs if job['status'] == 'queued']
+                if not queued and not running:
+                    return
+
+                cpu_in_use = sum(job['workers'] for job in self._jobs if job['id'] in running)
+                for job in queued:
+                    # Always allow one job, even if it alone exceeds the budget
+                    if running and cpu_in_use + job['workers'] > self.cpu_budget:
+                        continue
+                    job['status'] = 'running'
+                    job['runner'] = runner
+                    job['heartbeat'] = now
+                    job['attempts'] += 1
+                    cpu_in_use += job['workers']
+                    thread = threading.Thread(target=self._run_job, args=(job, progress_callback),
+                                              name=f"export-job-{job['id']}", daemon=True)
+                    running[job['id']] = (job, thread)
+                    thread.start()
+            time.sleep(poll_interval)
+
+    def _run_job(self, job, progress_callback):
+        """Render one job and record its outcome and throughput."""
+        if progress_callback:
+            progress_callback(dict(job))
+        start_time = time.monotonic()
+        try:
+            sorted_clips = sorted_timeline_clips(load_timeline(job['timeline']))
+            settings = probe_export_settings(sorted_clips, fourcc=select_fourcc(job['output']))
+            export = ResumableExport(sorted_clips, job['output'], settings, conform_workers=job['workers'])
+            export.run()
+            error = None
+        except Exception as e:
+            export = None
+            error = str(e)
+
+        elapsed = time.monotonic() - start_time
+        with self._transaction([job]):
+            job['runner'] = job['heartbeat'] = None
+            job['seconds'] = elapsed
+            if error is None:
+                job['status'] = 'done'
+                job['error'] = None
+                job['frames'] = export.frames_written
+                job['fps'] = export.frames_written / elapsed if elapsed > 0 else 0.0
+            else:
+                job['error'] = error
+                if job['attempts'] < self.max_attempts:
+                    # Retry after the rest of the queue
+                    self._jobs.remove(job)
+                    self._jobs.append(job)
+                    job['status'] = 'queued'
+                else:
+                    job['status'] = 'failed'
+            job_snapshot = dict(job)
+        if progress_callback:
+            progress_callback(job_snapshot)
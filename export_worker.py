@@ -0,0 +1,79 @@
+import os
+import time
+from PyQt5.QtCore import QThread, pyqtSignal
+
+# --- Background Export Worker ---
+# Runs an export job (ExportPipeline or ParallelExport from export_engine) off the
+# GUI thread and reports progress through Qt signals, so the main window stays
+# responsive and the export can be cancelled. The job itself is created on the
+# worker thread too: choosing the encoder benchmarks them on the first export.
+
+class ExportWorker(QThread):
+    """QThread that drives an export job and reports frames done, frames/sec and ETA."""
+
+    # Define signals that the worker can emit
+    progressChanged = pyqtSignal(int, int, float, float) # frames done, total frames, frames per second, ETA in seconds
+    exportFinished = pyqtSignal(str) # Emitted on success, passes output path
+    exportFailed = pyqtSignal(str) # Emitted on failure, passes error message
+    exportCancelled = pyqtSignal() # Emitted after a cancelled export has been cleaned up
+
+    def __init__(self, job_factory, output_path, parent=None, poll_interval=0.2):
+        super().__init__(parent)
+        self.job_factory = job_factory # Called on the worker thread to create the export job
+        self.job = None
+        self.output_path = output_path
+        self.poll_interval = poll_interval # Seconds between progress updates
+        self._cancel_requested = False
+
+    def cancel(self):
+        """Request cancellation. The job releases its writer and the partial output is removed."""
+        self._cancel_requested = True
+        if self.job is not None:
+            self.job.cancel()
+
+    def run(self):
+        """Create the export job, run it and poll it for progress."""
+        try:
+            self.job = self.job_factory()
+        except Exception as e:
+            self.exportFailed.emit(str(e))
+            return
+        if self._cancel_requested:
+            self.exportCancelled.emit() # Cancelled while preparing: nothing was written
+            return
+
+        start_time = time.monotonic()
+        try:
+            self.job.start()
+            while not self.job.wait(self.poll_interval):
+                self._emit_progress(start_time)
+            self._emit_progress(start_time)
+        except Exception as e:
+            self.exportFailed.emit(str(e))
+            return
+
+        if self._cancel_requested:
+            # The writers have been released by the job; drop the incomplete files
+            for path in getattr(self.job, 'output_paths', [self.output_path]):
+                if os.path.exists(path):
+                    try:
+                        os.remove(path)
+                    except OSError as e:
+                        print(f"Warning: Could not remove cancelled export file {path}: {e}")
+            self.exportCancelled.emit()
+        elif self.job.error is not None:
+            self.exportFailed.emit(f"Failed to export timeline: {self.job.error}")
+        else:
+            self.exportFinished.emit(self.output_path)
+
+    def _emit_progress(self, start_time):
+        """Emit the current frame count, throughput and estimated time remaining."""
+        frames_done = self.job.frames_written
+        total_frames = self.job.total_frames
+        elapsed = time.monotonic() - start_time
+        frames_per_second = frames_done / elapsed if elapsed > 0 else 0.0
+        if frames_per_second > 0 and total_frames > frames_done:
+            eta_seconds = (total_frames - frames_done) / frames_per_second
+        else:
+            eta_seconds = 0.0
+        self.progressChanged.emit(frames_done, total_frames, frames_per_second, eta_seconds)
@@ -0,0 +1,93 @@
+import os
+import threading
+from collections import OrderedDict
+
+# --- Decoded Frame Cache ---
+# A process-wide, memory-bounded cache of decoded preview frames keyed by
+# (video_path, signature, frame_index). The preview decoders put every frame
+# they prepare here, so scrubbing back over a region that was just played or
+# scrubbed is served from memory instead of seeking and decoding again. The least
+# recently used frames are evicted once the cache exceeds its megabyte budget.
+#
+# The signature is the file's size and mtime (see file_signature), taken when a
+# decoder opens the file. A source or proxy re-rendered in place gets a new
+# signature, so its old frames are never served again and simply age out.
+
+DEFAULT_FRAME_CACHE_MB = 512
+
+
+def file_signature(video_path):
+    """Return (size, mtime) of a file, or None if it doesn't exist."""
+    try:
+        stat = os.stat(video_path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class FrameCache:
+    """Thread-safe LRU cache of decoded frames (numpy arrays) with a memory budget."""
+
+    def __init__(self, budget_mb=DEFAULT_FRAME_CACHE_MB):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self._frames = OrderedDict() # (video_path, signature, frame_index) -> frame, least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, video_path, signature, frame_index, shape=None):
+        """Return the cached frame, or None. A frame of a different shape (e.g. preview size) counts as a miss."""
+        key = (video_path, signature, frame_index)
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is None or (shape is not None and frame.shape[:2] != tuple(shape)):
+                self.misses += 1
+                return None
+            self._frames.move_to_end(key)
+            self.hits += 1
+            return frame
+
+    def put(self, video_path, signature, frame_index, frame):
+        """Cache a frame, evicting the least recently used frames to stay within the budget."""
+        if frame.nbytes > self.budget_bytes:
+            return
+        key = (video_path, signature, frame_index)
+        with self._lock:
+            previous = self._frames.pop(key, None)
+            if previous is not None:
+                self.bytes_used -= previous.nbytes
+            self._frames[key] = frame
+            self.bytes_used += frame.nbytes
+            self._evict()
+
+    def set_budget(self, budget_mb):
+        """Change the memory budget, evicting frames if the cache is now over it."""
+        with self._lock:
+            self.budget_bytes = int(budget_mb * 1024 * 1024)
+            self._evict()
+
+    def clear(self):
+        """Drop every cached frame and reset the counters."""
+        with self._lock:
+            self._frames.clear()
+            self.bytes_used = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return {'frames', 'megabytes', 'budget_mb', 'hits', 'misses', 'hit_rate'}."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'frames': len(self._frames), 'megabytes': self.bytes_used / (1024 * 1024),
+                    'budget_mb': self.budget_bytes / (1024 * 1024), 'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else 0.0}
+
+    def _evict(self):
+        """Drop least recently used frames until the cache fits its budget. Callers hold the lock."""
+        while self.bytes_used > self.budget_bytes and self._frames:
+            _, frame = self._frames.popitem(last=False)
+            self.bytes_used -= frame.nbytes
+
+
+shared_frame_cache = FrameCache() # Shared by every preview decoder in the process
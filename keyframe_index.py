@@ -0,0 +1,116 @@
+import os
+import json
+import queue
+import bisect
+import hashlib
+import threading
+
+from media_probe import scan_frame_index
+
+# --- Keyframe Index ---
+# Keyframe positions and per-frame timestamps of every imported file, built once
+# by a background indexer and stored in the project folder. With the index a
+# preview seek jumps straight to the keyframe at or before the target and grabs
+# forward only the frames in between, instead of relying on CAP_PROP_POS_FRAMES,
+# which on long-GOP H.264 decodes an unknown run of frames and can land a frame
+# off. Index files are keyed by the source file's path, size and mtime, so an
+# edited file is indexed again.
+
+KEYFRAME_INDEX_DIR_NAME = "keyframe_index"
+KEYFRAME_INDEX_VERSION = 1
+
+
+def nearest_keyframe(frame_index, target_frame):
+    """Return the last keyframe at or before target_frame (0 if there is none)."""
+    keyframes = frame_index['keyframes']
+    position = bisect.bisect_right(keyframes, target_frame)
+    return keyframes[position - 1] if position else 0
+
+
+class KeyframeIndex:
+    """Per-project store of keyframe indexes with a background indexing thread."""
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        self._indexes = {} # video_path -> loaded index (or None if the file can't be indexed)
+        self._lock = threading.Lock()
+        self._pending = queue.Queue()
+        self._queued = set()
+        self._thread = None
+
+    def index_key(self, video_path):
+        """Return the key of a file's index, or None if the file doesn't exist."""
+        video_path = os.path.realpath(video_path)
+        if not os.path.exists(video_path):
+            return None
+        stat = os.stat(video_path)
+        key_fields = {'version': KEYFRAME_INDEX_VERSION, 'video_path': video_path,
+                      'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+        return hashlib.sha1(json.dumps(key_fields, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, video_path):
+        """Return the index of a file if it has been built, or None. Never scans the file."""
+        with self._lock:
+            if video_path in self._indexes:
+                return self._indexes[video_path]
+        key = self.index_key(video_path)
+        index_path = os.path.join(self.index_dir, f"{key}.json") if key else None
+        if index_path is None or not os.path.exists(index_path):
+            return None
+        try:
+            with open(index_path, "r", encoding="utf-8") as index_file:
+                frame_index = json.load(index_file)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._indexes[video_path] = frame_index
+        return frame_index
+
+    def get_or_build(self, video_path):
+        """Return the index of a file, scanning it now if it hasn't been built. None if it can't be indexed."""
+        with self._lock:
+            if video_path in self._indexes:
+                return self._indexes[video_path] # Also remembers files that can't be indexed
+        frame_index = self.get(video_path)
+        return frame_index if frame_index is not None else self.build(video_path)
+
+    def build(self, video_path):
+        """Scan a file and store its index. Returns the index, or None if the file can't be indexed."""
+        key = self.index_key(video_path)
+        frame_index = scan_frame_index(video_path) if key else None
+        if frame_index is not None and frame_index['keyframes']:
+            os.makedirs(self.index_dir, exist_ok=True)
+            index_path = os.path.join(self.index_dir, f"{key}.json")
+            temp_path = index_path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as index_file:
+                json.dump(frame_index, index_file)
+            os.replace(temp_path, index_path)
+        else:
+            frame_index = None # Without keyframes the index can't help seeking
+        with self._lock:
+            self._indexes[video_path] = frame_index
+        return frame_index
+
+    def index_in_background(self, video_path):
+        """Queue a file for indexing unless its index already exists."""
+        with self._lock:
+            if video_path in self._queued:
+                return
+            self._queued.add(video_path)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._index_loop, name="keyframe-indexer", daemon=True)
+                self._thread.start()
+        self._pending.put(video_path)
+
+    def _index_loop(self):
+        """Index queued files one at a time."""
+        while True:
+            video_path = self._pending.get()
+            try:
+                if self.get(video_path) is None:
+                    self.build(video_path)
+            except Exception as e:
+                print(f"Warning: Could not index keyframes of {os.path.basename(video_path)}: {e}")
+            finally:
+                with self._lock:
+                    self._queued.discard(video_path)
@@ -0,0 +1,70 @@
+import cv2
+
+# --- Media Probing ---
+# Cheap, Qt-free inspection of video files with OpenCV: stream parameters and
+# keyframe positions. Keyframes are found by reading the compressed packets in
+# raw mode (CAP_PROP_FORMAT = -1), so nothing is decoded.
+
+# Fourcc codes grouped by the codec they produce/contain
+CODEC_FAMILIES = {
+    'mpeg4': ('mp4v', 'fmp4', 'xvid', 'divx', 'dx50'),
+    'h264': ('avc1', 'h264', 'x264', 'davc'),
+    'hevc': ('hev1', 'hvc1', 'hevc', 'h265', 'x265'),
+    'mjpeg': ('mjpg', 'avrn', 'mjpa'),
+}
+
+
+def fourcc_to_string(fourcc_value):
+    """Convert an OpenCV CAP_PROP_FOURCC value to its four character code."""
+    fourcc_value = int(fourcc_value)
+    return "".join(chr((fourcc_value >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00 ")
+
+
+def codec_family(fourcc):
+    """Return the codec family name for a fourcc string, or the lowercased fourcc if unknown."""
+    fourcc = fourcc.lower()
+    for family, codes in CODEC_FAMILIES.items():
+        if fourcc in codes:
+            return family
+    return fourcc
+
+
+def probe_stream(video_path):
+    """Return the video stream parameters of a file, or None if it cannot be opened."""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return None
+    try:
+        fourcc = fourcc_to_string(cap.get(cv2.CAP_PROP_FOURCC))
+        return {
+            'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'fps': cap.get(cv2.CAP_PROP_FPS),
+            'frame_count': int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+            'fourcc': fourcc,
+            'codec': codec_family(fourcc),
+        }
+    finally:
+        cap.release()
+
+
+def scan_frame_index(video_path):
+    """Return {'keyframes', 'timestamps_ms'} for every packet of a file's video stream, or None if unavailable."""
+    if not hasattr(cv2, 'CAP_PROP_LRF_HAS_KEY_FRAME'):
+        return None # OpenCV build too old to report keyframes
+    cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG)
+    if not cap.isOpened():
+        return None
+    try:
+        # Raw mode: grab() returns compressed packets without decoding them
+        if not cap.set(cv2.CAP_PROP_FORMAT, -1):
+            return None
+        keyframes = []
+        timestamps_ms = []
+        while cap.grab():
+            if cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                keyframes.append(len(timestamps_ms))
+            timestamps_ms.append(cap.get(cv2.CAP_PROP_POS_MSEC))
+        return {'keyframes': keyframes, 'timestamps_ms': timestamps_ms}
+    finally:
+        cap.release()
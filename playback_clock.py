@@ -0,0 +1,67 @@
+import time
+
+# --- Playback Clock ---
+# Preview playback follows the wall clock instead of counting timer ticks. The
+# frame that should be on screen is computed from the monotonic time elapsed
+# since playback started, so a late tick or a fractional frame rate (29.97 fps)
+# never makes playback drift. When the decoder or the GUI falls behind, frames
+# are dropped to catch up, and the drops are counted.
+
+
+class PlaybackClock:
+    """Maps monotonic time to the frame that is due, and counts frames dropped to stay in sync."""
+
+    def __init__(self, fps=0):
+        self.fps = fps
+        self.running = False
+        self.dropped_frames = 0 # Frames skipped since playback started, to keep up with real time
+        self.presented_frames = 0
+        self._origin_time = 0.0
+        self._origin_frame = 0
+        self._last_presented = -1
+
+    def start(self, frame, fps=None, origin_time=None):
+        """Start (or restart after a seek) counting from `frame` at origin_time (default: now).
+
+        Passing the time the previous clip's end was due as origin_time hands
+        playback over to the next clip without losing or gaining any time.
+        """
+        if fps is not None:
+            self.fps = fps
+        self._origin_time = time.monotonic() if origin_time is None else origin_time
+        self._origin_frame = frame
+        self._last_presented = frame - 1
+        self.running = True
+
+    def stop(self):
+        """Stop the clock. The counters are kept until the next reset()."""
+        self.running = False
+
+    def reset(self):
+        """Clear the dropped and presented frame counters."""
+        self.dropped_frames = 0
+        self.presented_frames = 0
+
+    def due_frame(self):
+        """Return the frame that should be on screen right now."""
+        if not self.running or self.fps <= 0:
+            return self._last_presented + 1
+        # The small epsilon keeps a tick landing exactly on a frame boundary from rounding down
+        return self._origin_frame + int((time.monotonic() - self._origin_time) * self.fps + 1e-6)
+
+    def time_of_frame(self, frame):
+        """Return the monotonic time at which `frame` is (or was) due."""
+        if self.fps <= 0:
+            return time.monotonic()
+        return self._origin_time + (frame - self._origin_frame) / self.fps
+
+    def frame_presented(self, frame):
+        """Record that `frame` was shown, counting any frames skipped since the previous one."""
+        if frame > self._last_presented + 1:
+            self.dropped_frames += frame - self._last_presented - 1
+        self._last_presented = frame
+        self.presented_frames += 1
+
+    def tick_interval_ms(self):
+        """Return a timer interval that samples the clock at twice the frame rate."""
+        return max(1, int(500 / self.fps)) if self.fps > 0 else 16
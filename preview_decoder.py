@@ -0,0 +1,255 @@
+import os
+import time
+import threading
+from collections import deque
+import cv2
+
+from frame_cache import shared_frame_cache, file_signature
+from capture_pool import shared_capture_pool
+from keyframe_index import nearest_keyframe
+
+# --- Preview Decoder ---
+# Decodes a clip for the preview on a background thread. Frames are read ahead
+# of the playhead into a small ring buffer, already scaled down to the preview
+# size, so the playback timer only has to hand a finished frame to the preview
+# canvas. Frames stay in OpenCV's BGR order, which the canvas paints directly,
+# and are never scaled up here: the canvas scales them while painting. A slow
+# frame (a keyframe, a disk hiccup) is absorbed by the buffer instead of
+# stalling the UI. OpenCV releases the GIL in read() and resize(), so the
+# decoder runs in parallel with the GUI thread.
+#
+# When playback falls behind, frames that are already late are grabbed but never
+# retrieved or scaled, which lets the decoder catch up with the clock.
+#
+# Every prepared frame also goes into the shared decoded-frame cache, so
+# scrubbing back over frames that were just shown doesn't decode them again.
+#
+# Once a file's keyframe index is built, a seek jumps to the keyframe at or
+# before the target and grabs forward to it. A seek a short way ahead within the
+# current GOP just grabs forward without seeking at all.
+#
+# At a reduced preview resolution (half or quarter) frames are scaled down right
+# after decoding, so the buffer, the frame cache and the canvas all handle the
+# small frames. If the source has a proxy next to it (<name>_proxy<ext>, as
+# written by the review package export) with the same frame count, the reduced
+# resolutions decode the proxy instead, which is what makes 4K sources play in
+# real time: OpenCV has no way to decode a full-size file at lower resolution.
+
+DEFAULT_PREVIEW_BUFFER_FRAMES = 12
+SCRUB_DECODE_TIMEOUT = 1.0 # Seconds frame_at() waits for a frame that isn't cached
+PREVIEW_RESOLUTIONS = [("Full", 1), ("1/2", 2), ("1/4", 4)] # (label, divisor of the preview size)
+PROXY_FILE_SUFFIX = "_proxy"
+
+
+def find_proxy(video_path):
+    """Return the path of a source file's proxy (<name>_proxy<ext> next to it), or None if there is none."""
+    base_path, extension = os.path.splitext(video_path)
+    proxy_path = f"{base_path}{PROXY_FILE_SUFFIX}{extension}"
+    return proxy_path if os.path.exists(proxy_path) else None
+
+
+class PreviewDecoder:
+    """Background decoder for one clip that keeps a ring buffer of ready-to-display frames."""
+
+    def __init__(self, video_path, buffer_frames=DEFAULT_PREVIEW_BUFFER_FRAMES, frame_cache=None, keyframe_index=None,
+                 capture_pool=None, resolution_divisor=1):
+        self.video_path = video_path
+        self.capacity = max(1, buffer_frames)
+        self.frame_cache = frame_cache or shared_frame_cache
+        self.keyframe_index = keyframe_index # KeyframeIndex of the project, or None to seek with CAP_PROP_POS_FRAMES
+        self.capture_pool = capture_pool or shared_capture_pool
+        self.resolution_divisor = max(1, int(resolution_divisor)) # Frames are prepared at 1/divisor of the preview size
+        self.decode_path = video_path # The proxy instead, when one is used
+        self._cap = self.capture_pool.checkout(video_path) # Only the decode thread touches it once started
+        opened = self._cap.isOpened()
+        if opened and self.resolution_divisor > 1:
+            self._use_proxy()
+        # Cached frames of the file are only valid for this version of it
+        self.decode_signature = file_signature(self.decode_path)
+        self.frame_count = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT)) if opened else 0
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS) if opened else 0
+        self.source_size = ((int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+                            if opened else (0, 0))
+
+        self._buffer = deque() # (frame index, BGR frame), in decode order
+        self._condition = threading.Condition()
+        # Index of the next frame the decoder reads; a pooled capture may not be at the start
+        self._next_frame = int(self._cap.get(cv2.CAP_PROP_POS_FRAMES)) if opened else 0
+        self._seek_request = None # Frame to continue from; the buffer is stale until the decoder handles it
+        self._display_size = None # (width, height) frames are scaled to fit, or None for full size
+        self._skip_before = 0 # Frames before this are late: grab them without retrieving
+        self._at_end = False
+        self._stopped = False
+        self._thread = None
+
+    def _use_proxy(self):
+        """Switch to decoding the source's proxy if it has one with the same frames."""
+        proxy_path = find_proxy(self.video_path)
+        if proxy_path is None:
+            return
+        proxy_cap = self.capture_pool.checkout(proxy_path)
+        if (proxy_cap.isOpened()
+                and int(proxy_cap.get(cv2.CAP_PROP_FRAME_COUNT)) == int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+                and abs(proxy_cap.get(cv2.CAP_PROP_FPS) - self._cap.get(cv2.CAP_PROP_FPS)) < 0.01):
+            self.capture_pool.checkin(self._cap)
+            self._cap = proxy_cap
+            self.decode_path = proxy_path
+        else:
+            self.capture_pool.checkin(proxy_cap) # Not a frame-accurate stand-in for the source
+
+    def isOpened(self):
+        """Return True if the clip could be opened (same spelling as cv2.VideoCapture)."""
+        return self._cap is not None and self._cap.isOpened()
+
+    def start(self, start_frame=0):
+        """Start decoding from start_frame in the background."""
+        if start_frame != self._next_frame:
+            self._seek_capture(max(0, int(start_frame)))
+        self._thread = threading.Thread(target=self._decode_loop, name="preview-decode", daemon=True)
+        self._thread.start()
+
+    def seek(self, frame_index):
+        """Continue decoding from frame_index, dropping the frames buffered so far."""
+        with self._condition:
+            self._seek_request = max(0, int(frame_index))
+            self._skip_before = 0
+            self._buffer.clear()
+            self._condition.notify_all()
+
+    def set_display_size(self, width, height):
+        """Scale frames decoded from now on down to fit (width, height), keeping the aspect ratio."""
+        self._display_size = (int(width), int(height)) if width > 0 and height > 0 else None
+
+    def frame_at(self, frame_index, timeout=SCRUB_DECODE_TIMEOUT):
+        """Return the BGR frame at frame_index for a paused preview (scrubbing), or None on timeout.
+
+        A cached frame is returned at once. Either way the decoder continues from
+        frame_index, so playback or further scrubbing carries on from there.
+        """
+        self.seek(frame_index)
+        frame = self.frame_cache.get(self.decode_path, self.decode_signature, frame_index, self._prepared_shape())
+        if frame is not None:
+            return frame
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._seek_request is not None or not (self._buffer or self._at_end):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stopped:
+                    return None
+                self._condition.wait(remaining)
+            if self._buffer and self._buffer[0][0] == frame_index:
+                return self._buffer[0][1] # Left in the buffer: it is also the first frame if playback starts here
+        return None
+
+    def read_due(self, due_frame):
+        """Return the latest buffered (frame index, BGR frame) at or before due_frame, dropping older ones.
+
+        Returns None if no frame is due yet or the decoder hasn't got one ready.
+        """
+        with self._condition:
+            # Frames the clock has passed are never shown, so the decoder needn't retrieve them
+            self._skip_before = max(self._skip_before, due_frame)
+            if self._seek_request is not None or not self._buffer or self._buffer[0][0] > due_frame:
+                return None
+            item = self._buffer.popleft()
+            while self._buffer and self._buffer[0][0] <= due_frame:
+                item = self._buffer.popleft()
+            self._condition.notify_all() # Room for the decoder again
+            return item
+
+    @property
+    def finished(self):
+        """True once the decoder reached the end of the file and every buffered frame was read."""
+        with self._condition:
+            return self._at_end and not self._buffer and self._seek_request is None
+
+    def release(self):
+        """Stop the decode thread and return the capture to the pool."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._cap is not None:
+            self.capture_pool.checkin(self._cap)
+            self._cap = None
+
+    def _decode_loop(self):
+        """Keep the buffer full, restarting from the requested frame after a seek."""
+        while True:
+            with self._condition:
+                while not self._stopped and self._seek_request is None and (self._at_end or len(self._buffer) >= self.capacity):
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                seek_to = self._seek_request
+                self._seek_request = None
+                if seek_to is not None:
+                    self._at_end = False
+
+            if seek_to is not None and not self._seek_capture(seek_to):
+                continue # Interrupted by a newer seek
+
+            if self._next_frame < self._skip_before:
+                ret, frame = self._cap.grab(), None # Late already: skip the retrieve and scaling
+            else:
+                ret, frame = self._cap.read()
+            prepared = self._prepare(frame) if frame is not None else None
+            with self._condition:
+                frame_index = self._next_frame
+                if ret:
+                    self._next_frame += 1 # The capture has moved on even if the frame is discarded below
+                if self._seek_request is not None:
+                    continue # A seek arrived while decoding: this frame is from the old position
+                if not ret:
+                    self._at_end = True
+                elif prepared is not None:
+                    self._buffer.append((frame_index, prepared))
+                    self.frame_cache.put(self.decode_path, self.decode_signature, frame_index, prepared)
+                self._condition.notify_all()
+
+    def _seek_capture(self, frame_index):
+        """Position the capture so the next read returns frame_index. Returns False if a newer seek interrupted it."""
+        frame_index_data = self.keyframe_index.get(self.decode_path) if self.keyframe_index is not None else None
+        if frame_index_data is None:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+            self._next_frame = frame_index
+            return True
+
+        keyframe = nearest_keyframe(frame_index_data, frame_index)
+        if not keyframe <= self._next_frame <= frame_index:
+            # Seeking to a keyframe is exact and decodes nothing before it
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+            self._next_frame = keyframe
+        while self._next_frame < frame_index:
+            if self._seek_request is not None or self._stopped:
+                return False
+            if not self._cap.grab():
+                break # Past the end of the file; the next read reports it
+            self._next_frame += 1
+        return True
+
+    def _scaled_size(self, width, height):
+        """Return the (width, height) a frame of the given size is prepared at (never larger than decoded)."""
+        if width <= 0 or height <= 0:
+            return width, height
+        if self._display_size is None:
+            scale = 1.0 / self.resolution_divisor
+        else:
+            display_width, display_height = (size / self.resolution_divisor for size in self._display_size)
+            scale = min(display_width / width, display_height / height, 1.0)
+        return max(1, int(width * scale)), max(1, int(height * scale))
+
+    def _prepared_shape(self):
+        """Return the (height, width) of frames prepared at the current display size."""
+        width, height = self._scaled_size(*self.source_size)
+        return height, width
+
+    def _prepare(self, frame):
+        """Scale a decoded BGR frame down to the display size."""
+        height, width = frame.shape[:2]
+        scaled_size = self._scaled_size(width, height)
+        if scaled_size != (width, height):
+            frame = cv2.resize(frame, scaled_size, interpolation=cv2.INTER_AREA)
+        return frame
@@ -0,0 +1,74 @@
+from PyQt5.QtWidgets import QWidget, QSizePolicy
+from PyQt5.QtGui import QColor, QFont, QPainter, QImage
+from PyQt5.QtCore import Qt, QRect
+
+# --- Preview Canvas ---
+# Paints preview frames straight from the decoder's buffers. A frame (a BGR
+# numpy array, as OpenCV decodes it) is wrapped in a Format_BGR888 QImage that
+# shares its memory, and QPainter scales it into the widget while painting, so
+# presenting a frame costs no colour conversion, no QPixmap upload and no
+# separately scaled copy. The canvas keeps a reference to the array for as long
+# as it is shown; the decoder never writes to a frame once it has handed it out.
+#
+# Scaling in paint uses fast (nearest neighbour) sampling during playback and
+# smooth (bilinear) sampling when paused, where a single still frame is looked at.
+
+PREVIEW_PLACEHOLDER_TEXT = "Preview"
+
+
+class PreviewCanvas(QWidget):
+    """Preview area that paints BGR frames scaled to fit, keeping the aspect ratio."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.smooth_scaling = True
+        self._frame = None # Array the image wraps, kept alive while it is shown
+        self._image = None
+        self._text = PREVIEW_PLACEHOLDER_TEXT
+        self.setAttribute(Qt.WA_OpaquePaintEvent) # paintEvent fills the whole widget
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.setFont(QFont(self.font().family(), 20, QFont.Bold))
+
+    def show_frame(self, frame):
+        """Show a BGR frame (height x width x 3 uint8 array) without copying it."""
+        height, width = frame.shape[:2]
+        self._frame = frame
+        self._image = QImage(frame.data, width, height, frame.strides[0], QImage.Format_BGR888)
+        self._text = None
+        self.update()
+
+    def show_black(self):
+        """Show a black frame, as for a gap in the timeline."""
+        self._frame = self._image = None
+        self._text = None
+        self.update()
+
+    def show_placeholder(self, text=PREVIEW_PLACEHOLDER_TEXT):
+        """Show placeholder text instead of a frame."""
+        self._frame = self._image = None
+        self._text = text
+        self.update()
+
+    def set_smooth_scaling(self, smooth):
+        """Choose smooth (paused) or fast (playing) scaling, repainting if it changed."""
+        if smooth != self.smooth_scaling:
+            self.smooth_scaling = smooth
+            self.update()
+
+    def paintEvent(self, event):
+        """Fill with black and draw the frame (or the placeholder text) centered."""
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.black)
+        if self._image is not None:
+            painter.setRenderHint(QPainter.SmoothPixmapTransform, self.smooth_scaling)
+            painter.drawImage(self._target_rect(), self._image)
+        elif self._text:
+            painter.setPen(QColor("#888"))
+            painter.drawText(self.rect(), Qt.AlignCenter, self._text)
+        painter.end()
+
+    def _target_rect(self):
+        """Return the rectangle the frame is drawn into: as large as fits, centered."""
+        size = self._image.size().scaled(self.size(), Qt.KeepAspectRatio)
+        return QRect((self.width() - size.width()) // 2, (self.height() - size.height()) // 2,
+                     size.width(), size.height())
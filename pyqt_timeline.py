@@ -10,6 +10,8 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
 from PyQt5.QtGui import QColor, QBrush, QPen, QFont, QPainter, QImage, QPixmap, QIcon, QTransform
 from PyQt5.QtCore import Qt, QRectF, QPointF, QTimer, QTime, QUrl, QMimeData, QByteArray, QDataStream, QIODevice, pyqtSignal
 
+from timeline_model import timeline_duration
+
 # --- PyQt Timeline Component ---
 # This component provides a visual timeline with tracks, clips, playhead, and ruler.
 # It uses PyQt's Graphics View Framework for rendering and interaction.
@@ -91,6 +93,8 @@ class PyQtTimelineClip(QGraphicsRectItem):
         if event.button() == Qt.LeftButton:
             self._drag_start_pos = None # Reset drag data
             self.setCursor(Qt.OpenHandCursor) # Restore cursor
+            if self.scene() is not None:
+                self.scene().clipsChanged.emit() # The clip may have moved in time or to another track
             # Propagate the event
             super().mouseReleaseEvent(event)
 
@@ -134,6 +138,7 @@ class PyQtTimelineScene(QGraphicsScene):
     clipDoubleClicked = pyqtSignal(str) # Emitted when a clip is double-clicked, passes video path
     clipRightClicked = pyqtSignal(object, QPointF) # Emitted when a clip is right-clicked, passes clip item and scene position
     selectionChanged = pyqtSignal() # Emitted when selection changes
+    clipsChanged = pyqtSignal() # Emitted when clips are added, removed, moved, trimmed or split
 
     def __init__(self, timeline_view, parent=None):
         super().__init__(parent)
@@ -184,8 +189,9 @@ class PyQtTimelineScene(QGraphicsScene):
         clip_color = track_info['color'] # Use color defined in track info
 
         # Create a PyQtTimelineClip item
-        # Position the clip at the calculated x and track_y + padding
-        clip_item = PyQtTimelineClip(clip_data, x_pos, track_info['y'] + 10, clip_width, clip_height, clip_color)
+        # The rect starts at x=0 and the item is positioned at x_pos, so pos().x() is the clip's timeline position
+        clip_item = PyQtTimelineClip(clip_data, 0, track_info['y'] + 10, clip_width, clip_height, clip_color)
+        clip_item.setPos(x_pos, 0)
         self.addItem(clip_item)
         self.timeline_clips_items.append(clip_item) # Store the clip item
         self.timeline_data.append(clip_data) # Store the clip data
@@ -197,6 +203,7 @@ class PyQtTimelineScene(QGraphicsScene):
 
         # Update scene rectangle if needed
         self.update_scene_rect()
+        self.clipsChanged.emit()
 
         return clip_item # Return the created item
 
@@ -229,12 +236,37 @@ class PyQtTimelineScene(QGraphicsScene):
         timeline_scale = self.timeline_view.timeline_scale if self.timeline_view else 100 # Get scale from view
         for item in self.timeline_clips_items:
              item.clip_data['start_time'] = item.pos().x() / timeline_scale
-             # Update track based on current y position if needed (more complex)
-             # For simplicity, assuming track doesn't change visually unless explicitly moved to a new track area
-             # If implementing track snapping, you'd update track here based on snapped y_pos
+             # Dragging snaps clips between tracks, so take the track from the clip's current y position
+             clip_center_y = item.sceneBoundingRect().center().y()
+             for name, track_info in self.tracks.items():
+                 if track_info['y'] <= clip_center_y < track_info['y'] + track_info['height']:
+                     item.clip_data['track'] = name
+                     item.clip_data['track_type'] = track_info['type']
+                     break
 
         return self.timeline_data
 
+    def get_timeline_duration(self):
+        """Return the timeline length in seconds: the end of the last clip on any track."""
+        return timeline_duration(self.get_clips_data())
+
+    def clear_clips(self):
+        """Remove all clips from the timeline scene."""
+        for item in self.timeline_clips_items:
+            self.removeItem(item)
+        self.timeline_clips_items = []
+        self.timeline_data = []
+        self.clipsChanged.emit()
+
+    def load_clips_data(self, clips_data):
+        """Replace the timeline contents with the given clip data dictionaries."""
+        self.clear_clips()
+        timeline_scale = self.timeline_view.timeline_scale if self.timeline_view else 100
+        for clip_data in clips_data:
+            # Place each clip on its saved track, falling back to the first track
+            track_info = self.tracks.get(clip_data.get('track'), next(iter(self.tracks.values())))
+            self.add_clip(clip_data, clip_data.get('start_time', 0) * timeline_scale, track_info['y'])
+
     def move_playhead(self, x_pos):
         """Move the playhead item on the scene."""
         if self.playhead_item:
@@ -262,14 +294,20 @@ class PyQtTimelineView(QGraphicsView):
     clipDoubleClicked = pyqtSignal(str) # Emitted when a clip is double-clicked, passes video path
     clipRightClicked = pyqtSignal(object, QPointF) # Emitted when a clip is right-clicked, passes clip item and scene position
     selectionChanged = pyqtSignal() # Emitted when selection changes
+    clipsChanged = pyqtSignal() # Emitted when clips are added, removed, moved, trimmed or split
+    markersChanged = pyqtSignal() # Emitted when the in/out markers are set or cleared
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.timeline_scale = 100 # pixels per second
         self.playhead_callback = None # Callback for playhead movement (connected via signal)
+        self.in_point = None # In marker in seconds, None if not set
+        self.out_point = None # Out marker in seconds, None if not set
 
         self.scene = PyQtTimelineScene(self) # Create the scene
         self.setScene(self.scene) # Set the scene for the view
+        self.scene.playheadMoved.connect(self.playheadMoved) # Forward playhead moves from the scene
+        self.scene.clipsChanged.connect(self.clipsChanged) # Forward clip edits from the scene
 
 
         self.setRenderHint(QPainter.Antialiasing) # Smoother rendering
@@ -295,6 +333,59 @@ class PyQtTimelineView(QGraphicsView):
          """Set callback for playhead movement (connects to playheadMoved signal)."""
          self.playheadMoved.connect(callback)
 
+    def playhead_time(self):
+        """Return the playhead position in seconds."""
+        return self.scene.playhead_item.pos().x() / self.timeline_scale
+
+    def set_in_point(self, seconds=None):
+        """Set the in marker, at the playhead by default. An out marker before it is cleared."""
+        self.in_point = self.playhead_time() if seconds is None else max(0.0, seconds)
+        if self.out_point is not None and self.out_point <= self.in_point:
+            self.out_point = None
+        self.markersChanged.emit()
+        self.viewport().update()
+
+    def set_out_point(self, seconds=None):
+        """Set the out marker, at the playhead by default. An in marker after it is cleared."""
+        self.out_point = self.playhead_time() if seconds is None else max(0.0, seconds)
+        if self.in_point is not None and self.in_point >= self.out_point:
+            self.in_point = None
+        self.markersChanged.emit()
+        self.viewport().update()
+
+    def clear_in_out(self):
+        """Remove both markers."""
+        self.in_point = None
+        self.out_point = None
+        self.markersChanged.emit()
+        self.viewport().update()
+
+    def get_in_out_range(self):
+        """Return the marked (start, end) range in seconds, or None if no marker is set.
+
+        A missing in marker means the start of the timeline, a missing out marker its end.
+        """
+        if self.in_point is None and self.out_point is None:
+            return None
+        start = self.in_point if self.in_point is not None else 0.0
+        end = self.out_point if self.out_point is not None else self.scene.get_timeline_duration()
+        if end <= start:
+            return None
+        return start, end
+
+    def keyPressEvent(self, event):
+        """Handle marker keys: I sets the in marker, O the out marker, Alt+X clears both."""
+        if event.key() == Qt.Key_I and not event.modifiers():
+            self.set_in_point()
+        elif event.key() == Qt.Key_O and not event.modifiers():
+            self.set_out_point()
+        elif event.key() == Qt.Key_X and event.modifiers() == Qt.AltModifier:
+            self.clear_in_out()
+        else:
+            super().keyPressEvent(event)
+            return
+        event.accept()
+
     def mousePressEvent(self, event):
         """Handle mouse button press on the view."""
         scene_pos = self.mapToScene(event.pos())
@@ -428,6 +519,7 @@ class PyQtTimelineView(QGraphicsView):
 
             # Update scene rectangle after zoom
             self.scene.update_scene_rect()
+            self.scene.clipsChanged.emit() # Clip start times are positions divided by the new scale
 
             # Move playhead to maintain its time position relative to the zoom point
             # This is handled implicitly by the TransformAnchorRightClick and centering,
@@ -488,7 +580,9 @@ class PyQtTimelineView(QGraphicsView):
                 'duration': video_duration,
                 'frame_count': video_frame_count,
                 'fps': video_fps,
-                'start_time': 0 # Initial start time (will be set by add_clip)
+                'start_time': 0, # Initial start time (will be set by add_clip)
+                'source_in': 0, # First source frame used by the clip
+                'source_out': video_frame_count # Source frame just past the last one used
             }
 
             # Add the clip to the timeline scene
@@ -558,6 +652,20 @@ class PyQtTimelineView(QGraphicsView):
                  painter.drawText(int(x_pos_view) + 2, 15, time_text) # Cast to int
 
 
+        # Draw the in/out range on the ruler
+        marked_range = self.get_in_out_range()
+        if marked_range:
+            range_start_view = self.mapFromScene(QPointF(marked_range[0] * self.timeline_scale, 0)).x()
+            range_end_view = self.mapFromScene(QPointF(marked_range[1] * self.timeline_scale, 0)).x()
+            painter.fillRect(int(range_start_view), 0, int(range_end_view - range_start_view), ruler_height, QColor(255, 200, 0, 60))
+            painter.setPen(QPen(QColor("#ffc800"), 2))
+            if self.in_point is not None:
+                painter.drawLine(int(range_start_view), 0, int(range_start_view), ruler_height)
+                painter.drawLine(int(range_start_view), 0, int(range_start_view) + 5, 0) # [ bracket
+            if self.out_point is not None:
+                painter.drawLine(int(range_end_view), 0, int(range_end_view), ruler_height)
+                painter.drawLine(int(range_end_view) - 5, 0, int(range_end_view), 0) # ] bracket
+
         # Draw Playhead Handle on Ruler
         if self.scene.playhead_item:
              playhead_x_scene = self.scene.playhead_item.pos().x()
@@ -669,6 +777,7 @@ class PyQtTimelineView(QGraphicsView):
 
         # Update the scene rectangle after deletion
         self.scene.update_scene_rect()
+        self.scene.clipsChanged.emit()
 
         # Emit selection changed signal as selected items are deleted
         self.scene.selectionChanged.emit() # Emit from the scene
@@ -0,0 +1,225 @@
+import os
+import json
+import hashlib
+import shutil
+
+from export_engine import (ExportPipeline, ExportError, BackgroundExport, concatenate_segments, require_ffmpeg,
+                           build_render_sections, sections_frame_total, layer_source_frame)
+from smart_render import stream_copy_eligible, stream_copy_clip
+from keyframe_index import KeyframeIndex, KEYFRAME_INDEX_DIR_NAME
+from timeline_model import set_clip_source_range
+
+# --- Render Cache ---
+# Stores each render section's conformed, encoded segment in the project folder,
+# keyed by everything that affects its pixels (source file identity, frame rate
+# and source range of every visible layer, where the section starts within each
+# clip, layer opacity, output size/fps/codec). On a
+# single-track timeline a section is simply a clip or a gap. A re-export only
+# renders sections whose key changed and splices the cached segments together.
+#
+# A lookup touches the segment's modification time, so it records when the
+# segment was last used. After each export the least recently used segments are
+# deleted until the cache fits its size limit again.
+
+RENDER_CACHE_DIR_NAME = "render_cache"
+CACHE_FORMAT_VERSION = 2 # Bump when the rendering of a segment changes
+DEFAULT_CACHE_MAX_BYTES = 10 * 1024 ** 3
+PARTIAL_SEGMENT_SUFFIX = ".partial" # Marks a segment still being rendered
+
+
+class RenderCache:
+    """Directory of rendered clip segments keyed by clip and output settings."""
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes # Size the cache is trimmed back to by evict()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def section_key(self, section, settings):
+        """Return the cache key for a render section rendered with the given export settings."""
+        layers = []
+        for layer in section['layers']:
+            video_path = os.path.realpath(layer['clip'].get('video_path', ''))
+            stat = os.stat(video_path)
+            layers.append({
+                'video_path': video_path,
+                'mtime_ns': stat.st_mtime_ns,
+                'size': stat.st_size,
+                'source_in': layer['source_in'],
+                'source_out': layer['source_out'],
+                'source_fps': round(layer['source_fps'], 6),
+                'offset': section['start_frame'] - layer['start_frame'], # Output frames into the clip
+                'opacity': layer['opacity'],
+            })
+        key_fields = {
+            'version': CACHE_FORMAT_VERSION,
+            'layers': layers,
+            'frames': section['frames'], # The only thing that tells gaps apart
+            'width': settings['width'],
+            'height': settings['height'],
+            'fps': round(settings['fps'], 6),
+            'fourcc': settings['fourcc'],
+        }
+        return hashlib.sha1(json.dumps(key_fields, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def segment_path(self, key, extension=".mp4"):
+        """Return the path a segment with this key is stored at."""
+        return os.path.join(self.cache_dir, key + extension)
+
+    def lookup(self, key, extension=".mp4"):
+        """Return the cached segment path for a key, or None on a miss."""
+        path = self.segment_path(key, extension)
+        if os.path.exists(path):
+            os.utime(path) # The modification time is the last-used marker evict() goes by
+            return path
+        return None
+
+    def store(self, key, rendered_path, extension=".mp4"):
+        """Move a freshly rendered segment into the cache and return its cached path."""
+        path = self.segment_path(key, extension)
+        os.replace(rendered_path, path) # Atomic, so a crash never leaves a half-written entry
+        return path
+
+    def evict(self, keep=()):
+        """Delete the least recently used segments until the cache fits in max_bytes. Returns the bytes freed.
+
+        Segments in keep (such as those an export is joining) and partial
+        segments still being rendered are never deleted.
+        """
+        keep = {os.path.abspath(path) for path in keep}
+        entries = []
+        total_bytes = 0
+        with os.scandir(self.cache_dir) as scan:
+            for entry in scan:
+                if not entry.is_file():
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue # Deleted by another process meanwhile
+                total_bytes += stat.st_size
+                if PARTIAL_SEGMENT_SUFFIX not in entry.name and os.path.abspath(entry.path) not in keep:
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        freed_bytes = 0
+        for _, size, path in sorted(entries): # Least recently used first
+            if total_bytes - freed_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            freed_bytes += size
+        return freed_bytes
+
+    def clear(self):
+        """Remove every cached segment."""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+
+class CachedExport(BackgroundExport):
+    """Export that renders only sections missing from the render cache, then joins all section segments."""
+
+    thread_name = "export-cached"
+
+    def __init__(self, sorted_clips, output_path, settings, render_cache, conform_workers=None, smart_render=False, duration=None,
+                 keyframe_index=None):
+        super().__init__(sorted_clips, output_path, settings)
+        self.render_cache = render_cache
+        self.conform_workers = conform_workers
+        self.smart_render = smart_render # Stream copy clips that already match the output
+        # Keyframes of the sources; by default kept in the project folder the render cache is in
+        self.keyframe_index = keyframe_index or KeyframeIndex(
+            os.path.join(os.path.dirname(os.path.abspath(render_cache.cache_dir)), KEYFRAME_INDEX_DIR_NAME))
+        self.extension = os.path.splitext(output_path)[1] or ".mp4"
+        self.sections = build_render_sections(sorted_clips, settings['fps'], duration)
+        self.total_frames = sections_frame_total(self.sections)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.stream_copies = 0
+        self._current_pipeline = None
+
+    def cancel(self):
+        """Stop after the section currently rendering; its partial segment is discarded."""
+        super().cancel()
+        if self._current_pipeline is not None:
+            self._current_pipeline.cancel()
+
+    def _export(self):
+        """Resolve every section to a cached segment, rendering misses, and join them."""
+        require_ffmpeg("Exporting through the render cache")
+        segment_paths = []
+        for section in self.sections:
+            if self.cancelled:
+                return
+            key = self.render_cache.section_key(section, self.settings)
+            cached_path = self.render_cache.lookup(key, self.extension)
+            if cached_path is None:
+                self.cache_misses += 1
+                cached_path = self._render_section(section, key)
+                if cached_path is None:
+                    continue
+            else:
+                self.cache_hits += 1
+                self.frames_written += section['frames']
+                self._report_progress()
+            segment_paths.append(cached_path)
+
+        if self.cancelled:
+            return
+        if not segment_paths:
+            raise ExportError("No valid video files found in timeline clips.")
+        concatenate_segments(segment_paths, self.output_path, self.settings)
+        print(f"Render cache: {self.cache_hits} section(s) reused, {self.cache_misses} rendered ({self.stream_copies} stream copied).")
+        freed_bytes = self.render_cache.evict(keep=segment_paths)
+        if freed_bytes:
+            print(f"Render cache: evicted {freed_bytes / 1024 ** 2:.1f} MB of least recently used segments.")
+
+    def _render_section(self, section, key):
+        """Render one section into the cache. Returns the cached path, or None if it produced no frames."""
+        temp_path = self.render_cache.segment_path(key + PARTIAL_SEGMENT_SUFFIX, self.extension)
+        frames_before = self.frames_written
+        first_frame = section['start_frame']
+        end_frame = first_frame + section['frames']
+
+        # Only a single opaque layer can skip decoding; composites always re-encode
+        if self.smart_render and len(section['layers']) == 1 and section['layers'][0]['opacity'] >= 1.0:
+            layer = section['layers'][0]
+            # The clip trimmed to the source frames this section shows
+            clip_data = dict(layer['clip'])
+            set_clip_source_range(clip_data, layer_source_frame(layer, first_frame, self.settings['fps']),
+                                  layer_source_frame(layer, end_frame - 1, self.settings['fps']) + 1)
+            eligible, reason = stream_copy_eligible(clip_data, self.settings, self.keyframe_index, self.extension)
+            if eligible and clip_data['frame_count'] != section['frames']:
+                eligible, reason = False, "source runs short of the section"
+            if eligible:
+                self.frames_written += stream_copy_clip(clip_data, temp_path, self.settings, self.keyframe_index)
+                self.stream_copies += 1
+                self._report_progress()
+                return self.render_cache.store(key, temp_path, self.extension)
+            print(f"Smart render: re-encoding {os.path.basename(clip_data['video_path'])} ({reason}).")
+
+        layer_clips = [layer['clip'] for layer in section['layers']]
+        pipeline = ExportPipeline(layer_clips, temp_path, self.settings, conform_workers=self.conform_workers,
+                                  frame_range=(first_frame, end_frame))
+        self._current_pipeline = pipeline
+        try:
+            pipeline.start(lambda done, total: self._on_section_progress(frames_before, done))
+            pipeline.wait()
+        finally:
+            self._current_pipeline = None
+        self.clip_stats.extend(pipeline.clip_stats)
+
+        if pipeline.cancelled or pipeline.error is not None or pipeline.frames_written == 0:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            if pipeline.error is not None:
+                raise pipeline.error
+            return None
+        return self.render_cache.store(key, temp_path, self.extension)
+
+    def _on_section_progress(self, frames_before, section_frames_done):
+        """Translate per-section pipeline progress into overall progress."""
+        self.frames_written = frames_before + section_frames_done
+        self._report_progress()
@@ -0,0 +1,269 @@
+import argparse
+import os
+import sys
+import time
+
+from export_engine import (ExportPipeline, ParallelExport, ExportError, probe_export_settings,
+                           default_conform_workers, ffmpeg_path, segmented_target)
+from render_cache import RenderCache, CachedExport, RENDER_CACHE_DIR_NAME
+from render_node import RenderNodeServer, DistributedExport, DEFAULT_NODE_PORT
+from export_queue import ExportQueue
+from resumable_export import ResumableExport, DEFAULT_CHECKPOINT_SECONDS
+from encoder_probe import probe_encoders, select_fourcc, QUALITY_TIERS, DEFAULT_QUALITY
+from timeline_model import load_timeline, sorted_timeline_clips, timeline_duration
+
+# --- Headless Render Entry Point ---
+# Renders a timeline saved with File > Save Timeline without creating a
+# QApplication, so batch/farm machines don't need Qt or an X11 display.
+#
+#   python -m render_cli render project.json out.mp4 --workers 8
+#   python -m render_cli render project.json out.mp4 --processes 16
+#   python -m render_cli render project.json out.mp4 --cache --smart-render
+#   python -m render_cli render project.json excerpt.mp4 --in 600 --out 620
+#   python -m render_cli render project.json out.mp4 --resume
+#   python -m render_cli render project.json review_stream/ --segment-seconds 4
+#   python -m render_cli render project.json out.mp4 --quality high
+#   python -m render_cli encoders --extension .mkv --refresh
+#   python -m render_cli node --port 7878
+#   python -m render_cli render project.json out.mp4 --nodes box1:7878,box2:7878
+#   python -m render_cli queue add project.json out.mp4 --project /path/to/project
+#   python -m render_cli queue run --project /path/to/project --budget 16
+
+
+class ProgressPrinter:
+    """Prints export progress to stderr at most once per interval."""
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.start_time = time.monotonic()
+        self._last_print = 0.0
+
+    def __call__(self, frames_done, total_frames):
+        now = time.monotonic()
+        if now - self._last_print < self.interval and frames_done < total_frames:
+            return
+        self._last_print = now
+        elapsed = now - self.start_time
+        frames_per_second = frames_done / elapsed if elapsed > 0 else 0.0
+        print(f"\r{frames_done}/{total_frames} frames, {frames_per_second:.1f} fps", end="", file=sys.stderr, flush=True)
+
+
+def render_modes(args):
+    """Return the options that pick the export job, one string per kind of job requested."""
+    modes = []
+    # --in/--out and --segment-seconds all go through the pipelined export, so they combine
+    pipelined = [flag for flag, value in (("--in", args.range_in), ("--out", args.range_out),
+                                          ("--segment-seconds", args.segment_seconds)) if value is not None]
+    if pipelined:
+        modes.append("/".join(pipelined))
+    if args.nodes:
+        modes.append("--nodes")
+    if args.resume:
+        modes.append("--resume")
+    if args.processes and args.processes > 1:
+        modes.append("--processes")
+    cached = [flag for flag, value in (("--cache", args.cache), ("--smart-render", args.smart_render)) if value]
+    if cached:
+        modes.append("/".join(cached))
+    return modes
+
+
+def check_render_options(parser, args):
+    """Reject options that would select different export jobs, rather than silently ignoring some."""
+    modes = render_modes(args)
+    if len(modes) > 1:
+        parser.error(f"render: {' and '.join(modes)} can't be combined; choose one.")
+    if args.cache_dir and not (args.cache or args.smart_render):
+        parser.error("render: --cache-dir needs --cache or --smart-render.")
+
+
+def build_export_job(sorted_clips, output_path, settings, args):
+    """Create the export job selected by the command line options."""
+    # With --segment-seconds the output path is a folder of segments plus manifest.json/playlist.m3u8
+    targets = [segmented_target(output_path, settings, args.segment_seconds)] if args.segment_seconds else None
+    if args.range_in is not None or args.range_out is not None:
+        range_in = args.range_in or 0.0
+        range_out = args.range_out if args.range_out is not None else timeline_duration(sorted_clips)
+        if range_out <= range_in:
+            raise ExportError("--out must be after --in.")
+        frame_range = (int(round(range_in * settings['fps'])), int(round(range_out * settings['fps'])))
+        return ExportPipeline(sorted_clips, output_path, settings, conform_workers=args.workers, targets=targets,
+                              frame_range=frame_range)
+    if targets:
+        return ExportPipeline(sorted_clips, output_path, settings, conform_workers=args.workers, targets=targets)
+    if args.nodes:
+        return DistributedExport(sorted_clips, output_path, settings, args.nodes.split(","))
+    if args.resume:
+        return ResumableExport(sorted_clips, output_path, settings, conform_workers=args.workers,
+                               checkpoint_seconds=args.checkpoint_seconds)
+    if args.processes and args.processes > 1:
+        return ParallelExport(sorted_clips, output_path, settings, processes=args.processes)
+    if args.cache or args.smart_render:
+        if not ffmpeg_path():
+            raise ExportError("--cache and --smart-render need ffmpeg on the PATH.")
+        cache_dir = args.cache_dir or os.path.join(os.path.dirname(os.path.abspath(args.timeline)), RENDER_CACHE_DIR_NAME)
+        return CachedExport(sorted_clips, output_path, settings, RenderCache(cache_dir),
+                            conform_workers=args.workers, smart_render=args.smart_render)
+    return ExportPipeline(sorted_clips, output_path, settings, conform_workers=args.workers)
+
+
+def render_command(args):
+    """Render a saved timeline to a video file."""
+    clips_data = load_timeline(args.timeline)
+    if not clips_data:
+        print("No clips in timeline to export.", file=sys.stderr)
+        return 1
+
+    sorted_clips = sorted_timeline_clips(clips_data)
+    # Segments are always .mp4 files, whatever the output folder is called
+    encoded_path = os.path.join(args.output, "segment.mp4") if args.segment_seconds else args.output
+    fourcc = args.fourcc or select_fourcc(encoded_path, args.quality)
+    settings = probe_export_settings(sorted_clips, fourcc=fourcc)
+    job = build_export_job(sorted_clips, args.output, settings, args)
+
+    start_time = time.monotonic()
+    try:
+        job.run(ProgressPrinter())
+    except KeyboardInterrupt:
+        job.cancel()
+        job.wait()
+        if args.resume:
+            print("\nExport cancelled. Run the same command again to resume it.", file=sys.stderr)
+        else:
+            print("\nExport cancelled.", file=sys.stderr)
+        return 130
+    elapsed = time.monotonic() - start_time
+    print(f"\nExported {job.frames_written} frames to {args.output} in {elapsed:.1f}s.", file=sys.stderr)
+    return 0
+
+
+def node_command(args):
+    """Run a render node that serves segment jobs until interrupted."""
+    server = RenderNodeServer(args.host, args.port, conform_workers=args.workers)
+    print(f"Render node listening on {args.host}:{args.port} with {server.conform_workers} conform workers.", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def encoders_command(args):
+    """Print the encoder benchmark for a container, running it if it isn't cached yet."""
+    results = probe_encoders(args.extension, refresh=args.refresh)
+    if not results:
+        print(f"No working encoders found for {args.extension} files.", file=sys.stderr)
+        return 1
+    for result in results:
+        tiers = [tier for tier, minimum_psnr in QUALITY_TIERS.items() if result['psnr'] >= minimum_psnr]
+        print(f"{result['fourcc']:<5} {result['fps']:8.1f} fps  {result['psnr']:5.1f} dB  "
+              f"{result['bytes_per_frame'] // 1024:6d} KiB/frame  {', '.join(tiers) or '-'}")
+    return 0
+
+
+def print_job(job):
+    """Print one export queue job with its throughput."""
+    line = f"{job['id']}  {job['status']:<8} attempt {job['attempts']}  {os.path.basename(job['output'])}"
+    if job['status'] == 'done':
+        line += f"  {job['frames']} frames in {job['seconds']:.1f}s ({job['fps']:.1f} fps)"
+    elif job.get('error'):
+        line += f"  error: {job['error']}"
+    print(line, file=sys.stderr)
+
+
+def queue_command(args):
+    """Add to, list or run the project's export queue."""
+    export_queue = ExportQueue(args.project, cpu_budget=args.budget, max_attempts=args.attempts)
+    if args.action == "add":
+        if not args.timeline or not args.output:
+            print("queue add needs a timeline file and an output path.", file=sys.stderr)
+            return 1
+        job = export_queue.add_job(load_timeline(args.timeline), os.path.abspath(args.output), workers=args.workers)
+        print_job(job)
+    elif args.action == "list":
+        for job in export_queue.jobs():
+            print_job(job)
+    elif args.action == "clear":
+        export_queue.remove_finished()
+    else:
+        export_queue.run(print_job)
+        failed_jobs = [job for job in export_queue.jobs() if job['status'] == 'failed']
+        return 1 if failed_jobs else 0
+    return 0
+
+
+def build_parser():
+    """Create the command line parser."""
+    parser = argparse.ArgumentParser(prog="render_cli", description="Headless timeline renderer.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    render_parser = subparsers.add_parser("render", help="Render a saved timeline (.json) to a video file.")
+    render_parser.add_argument("timeline", help="Timeline file saved from the editor.")
+    render_parser.add_argument("output", help="Output video path.")
+    render_parser.add_argument("--workers", type=int, default=default_conform_workers(),
+                               help="Conform threads for the pipelined export (default: %(default)s).")
+    render_parser.add_argument("--processes", type=int, default=0,
+                               help="Render segments in this many processes and join them.")
+    render_parser.add_argument("--fourcc", help="Output codec fourcc (default: fastest benchmarked encoder for --quality).")
+    render_parser.add_argument("--quality", choices=list(QUALITY_TIERS), default=DEFAULT_QUALITY,
+                               help="Quality tier used to pick the encoder (default: %(default)s).")
+    render_parser.add_argument("--cache", action="store_true", help="Reuse rendered clip segments (needs ffmpeg).")
+    render_parser.add_argument("--cache-dir", help="Render cache folder (default: render_cache next to the timeline).")
+    render_parser.add_argument("--smart-render", action="store_true",
+                               help="Stream copy clips that already match the output (needs ffmpeg).")
+    render_parser.add_argument("--nodes", help="Comma separated render nodes (host:port) to distribute segments to.")
+    render_parser.add_argument("--resume", action="store_true",
+                               help="Checkpoint segments next to the output and skip those finished by an earlier run.")
+    render_parser.add_argument("--checkpoint-seconds", type=float, default=DEFAULT_CHECKPOINT_SECONDS,
+                               help="Length of a checkpoint segment with --resume (default: %(default)s).")
+    render_parser.add_argument("--segment-seconds", type=float,
+                               help="Write the output folder as numbered segments of this length with a manifest "
+                                    "and playlist updated as each segment finishes (uses the pipelined export).")
+    render_parser.add_argument("--in", dest="range_in", type=float,
+                               help="Render only from this timeline time in seconds (uses the pipelined export).")
+    render_parser.add_argument("--out", dest="range_out", type=float,
+                               help="Render only up to this timeline time in seconds (uses the pipelined export).")
+    render_parser.set_defaults(func=render_command)
+
+    node_parser = subparsers.add_parser("node", help="Run a render node for distributed exports.")
+    node_parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: %(default)s).")
+    node_parser.add_argument("--port", type=int, default=DEFAULT_NODE_PORT, help="Port to listen on (default: %(default)s).")
+    node_parser.add_argument("--workers", type=int, default=default_conform_workers(),
+                             help="Conform threads per segment (default: %(default)s).")
+    node_parser.set_defaults(func=node_command)
+
+    encoders_parser = subparsers.add_parser("encoders", help="Show (or re-run) the encoder benchmark for this machine.")
+    encoders_parser.add_argument("--extension", default=".mp4", help="Output container to benchmark (default: %(default)s).")
+    encoders_parser.add_argument("--refresh", action="store_true", help="Run the benchmark again instead of using the cache.")
+    encoders_parser.set_defaults(func=encoders_command)
+
+    queue_parser = subparsers.add_parser("queue", help="Manage and run the project's export queue.")
+    queue_parser.add_argument("action", choices=["add", "list", "run", "clear"], help="clear removes finished jobs.")
+    queue_parser.add_argument("timeline", nargs="?", help="Timeline file to queue (add only).")
+    queue_parser.add_argument("output", nargs="?", help="Output video path (add only).")
+    queue_parser.add_argument("--project", default=".", help="Project folder holding the queue (default: current folder).")
+    queue_parser.add_argument("--workers", type=int, default=2, help="Conform threads for the queued job (default: %(default)s).")
+    queue_parser.add_argument("--budget", type=int, default=None,
+                              help="Total worker threads of jobs running at once (default: CPU count).")
+    queue_parser.add_argument("--attempts", type=int, default=3, help="Attempts per job before it fails (default: %(default)s).")
+    queue_parser.set_defaults(func=queue_command)
+    return parser
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "render":
+        check_render_options(parser, args)
+    try:
+        return args.func(args)
+    except (ExportError, OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
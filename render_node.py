@@ -0,0 +1,226 @@
+import os
+import json
+import queue
+import shutil
+import socket
+import struct
+import tempfile
+import threading
+import socketserver
+
+from export_engine import (ExportError, ExportPipeline, BackgroundExport, split_into_segments, concatenate_segments,
+                           require_ffmpeg, default_conform_workers)
+
+# --- Render Nodes ---
+# Spreads one export over several machines. A coordinator splits the timeline
+# into segment jobs and sends them over TCP to render nodes; each node renders
+# its segment and streams the file back, and the coordinator joins the segments.
+#
+# Messages are a 4-byte big-endian header length, a JSON header, and an optional
+# binary payload of header['payload_size'] bytes. Source media paths are sent as
+# they are, so nodes need the media at the same paths (shared storage).
+# There is no authentication: only run nodes on a trusted network.
+
+DEFAULT_NODE_PORT = 7878
+PROTOCOL_VERSION = 2
+CHUNK_SIZE = 1024 * 1024
+
+
+def send_message(sock, header, payload_path=None):
+    """Send a JSON header, followed by the contents of payload_path if given."""
+    header = dict(header, version=PROTOCOL_VERSION)
+    header['payload_size'] = os.path.getsize(payload_path) if payload_path else 0
+    header_bytes = json.dumps(header).encode("utf-8")
+    sock.sendall(struct.pack(">I", len(header_bytes)) + header_bytes)
+    if payload_path:
+        with open(payload_path, "rb") as payload_file:
+            sock.sendfile(payload_file)
+
+
+def recv_exact(sock, size):
+    """Read exactly size bytes from the socket."""
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(min(size, CHUNK_SIZE))
+        if not chunk:
+            raise ConnectionError("Render node connection closed unexpectedly.")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock, payload_path=None):
+    """Receive a message. A payload is written to payload_path. Returns the header."""
+    header_size = struct.unpack(">I", recv_exact(sock, 4))[0]
+    header = json.loads(recv_exact(sock, header_size).decode("utf-8"))
+    if header.get('version') != PROTOCOL_VERSION:
+        raise ConnectionError(f"Render node protocol mismatch (got version {header.get('version')}).")
+
+    remaining = header.get('payload_size', 0)
+    if remaining:
+        if payload_path is None:
+            raise ConnectionError("Unexpected payload from render node.")
+        with open(payload_path, "wb") as payload_file:
+            while remaining > 0:
+                chunk = sock.recv(min(remaining, CHUNK_SIZE))
+                if not chunk:
+                    raise ConnectionError("Render node connection closed unexpectedly.")
+                payload_file.write(chunk)
+                remaining -= len(chunk)
+    return header
+
+
+def parse_node_address(address):
+    """Parse 'host:port' (or just 'host') into a (host, port) tuple."""
+    host, _, port = address.rpartition(":")
+    if not host:
+        return address, DEFAULT_NODE_PORT
+    return host, int(port)
+
+
+# --- Render Node (worker side) ---
+
+class RenderNodeHandler(socketserver.BaseRequestHandler):
+    """Serves segment render jobs on one coordinator connection."""
+
+    def handle(self):
+        """Render segment jobs until the coordinator closes the connection."""
+        while True:
+            try:
+                header = recv_message(self.request)
+            except (ConnectionError, struct.error):
+                return
+
+            if header.get('type') == 'ping':
+                send_message(self.request, {'type': 'pong', 'workers': self.server.conform_workers})
+            elif header.get('type') == 'render':
+                self.render(header)
+            else:
+                send_message(self.request, {'type': 'error', 'message': f"Unknown message type: {header.get('type')}"})
+
+    def render(self, header):
+        """Render one segment and send it back."""
+        work_dir = tempfile.mkdtemp(prefix="render_node_")
+        try:
+            segment_path = os.path.join(work_dir, "segment" + header.get('extension', ".mp4"))
+            frame_range = (header['first_frame'], header['first_frame'] + header['frames'])
+            pipeline = ExportPipeline(header['clips'], segment_path, header['settings'],
+                                      conform_workers=self.server.conform_workers, frame_range=frame_range)
+            pipeline.run()
+            send_message(self.request, {'type': 'result', 'frames': pipeline.frames_written,
+                                        'clip_stats': pipeline.clip_stats}, segment_path)
+        except Exception as e:
+            send_message(self.request, {'type': 'error', 'message': str(e)})
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+class RenderNodeServer(socketserver.ThreadingTCPServer):
+    """TCP server that renders export segments for a coordinator."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_NODE_PORT, conform_workers=None):
+        super().__init__((host, port), RenderNodeHandler)
+        self.conform_workers = conform_workers or default_conform_workers()
+
+
+# --- Coordinator ---
+
+class DistributedExport(BackgroundExport):
+    """Export that renders segments on render nodes and joins them locally."""
+
+    thread_name = "export-distributed"
+
+    def __init__(self, sorted_clips, output_path, settings, nodes, segments_per_node=2, timeout=3600, duration=None):
+        super().__init__(sorted_clips, output_path, settings)
+        self.nodes = [parse_node_address(node) if isinstance(node, str) else tuple(node) for node in nodes]
+        # More segments than nodes lets fast nodes pick up extra work
+        self.segments = split_into_segments(sorted_clips, max(1, len(self.nodes) * segments_per_node), settings['fps'], duration)
+        self.timeout = timeout # Seconds to wait for one segment
+        self.total_frames = sum(segment['frames'] for segment in self.segments)
+        self._lock = threading.Lock()
+        self._sockets = []
+
+    def cancel(self):
+        """Stop handing out segments and drop the node connections."""
+        super().cancel()
+        with self._lock:
+            for sock in self._sockets:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def _export(self):
+        """Send segments to the nodes, then join the returned files."""
+        output_dir = os.path.dirname(os.path.abspath(self.output_path))
+        extension = os.path.splitext(self.output_path)[1] or ".mp4"
+        work_dir = tempfile.mkdtemp(prefix=".export_segments_", dir=output_dir)
+        try:
+            if not self.nodes:
+                raise ExportError("No render nodes given.")
+            require_ffmpeg("A distributed export")
+            segment_paths = [os.path.join(work_dir, f"segment_{i:04d}{extension}") for i in range(len(self.segments))]
+            pending = queue.Queue()
+            for index in range(len(self.segments)):
+                pending.put(index)
+            done = set()
+            node_errors = []
+
+            threads = [threading.Thread(target=self._node_loop, args=(node, pending, segment_paths, extension, done, node_errors),
+                                        name=f"render-node-{node[0]}:{node[1]}", daemon=True)
+                       for node in self.nodes]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            if self.cancelled:
+                return
+            if len(done) < len(self.segments):
+                raise ExportError("Render nodes failed before all segments were rendered: " + "; ".join(node_errors))
+            concatenate_segments(segment_paths, self.output_path, self.settings)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _node_loop(self, node, pending, segment_paths, extension, done, node_errors):
+        """Feed segments to one node until none are left. A failed segment is returned to the queue."""
+        try:
+            sock = socket.create_connection(node, timeout=self.timeout)
+        except OSError as e:
+            node_errors.append(f"{node[0]}:{node[1]}: {e}")
+            return
+        with self._lock:
+            self._sockets.append(sock)
+
+        try:
+            while not self.cancelled and len(done) < len(self.segments):
+                try:
+                    index = pending.get(timeout=0.2)
+                except queue.Empty:
+                    continue # Segments still in flight elsewhere may come back if their node fails
+                try:
+                    segment = self.segments[index]
+                    send_message(sock, {'type': 'render', 'clips': segment['clips'], 'first_frame': segment['first_frame'],
+                                        'frames': segment['frames'], 'settings': self.settings, 'extension': extension})
+                    header = recv_message(sock, segment_paths[index])
+                except (OSError, ConnectionError, ValueError) as e:
+                    # Give the segment to another node and retire this one
+                    pending.put(index)
+                    node_errors.append(f"{node[0]}:{node[1]}: {e}")
+                    return
+
+                if header.get('type') != 'result':
+                    pending.put(index)
+                    node_errors.append(f"{node[0]}:{node[1]}: {header.get('message', 'unexpected reply')}")
+                    return
+
+                with self._lock:
+                    done.add(index)
+                    self.frames_written += header.get('frames', 0)
+                    self.clip_stats.extend(header.get('clip_stats', []))
+                self._report_progress()
+        finally:
+            sock.close()
@@ -0,0 +1,152 @@
+import os
+import json
+import hashlib
+import shutil
+
+from export_engine import (ExportPipeline, ExportError, BackgroundExport, concatenate_segments, require_ffmpeg,
+                           build_render_sections, sections_frame_total, clips_in_frame_range)
+
+# --- Resumable Export ---
+# Renders the timeline as fixed-length checkpoint segments in <output>.parts/
+# next to the output, recording each finished segment in a manifest. If the
+# export is cancelled, crashes or the machine is preempted, running it again
+# with the same timeline and settings skips the finished segments and only
+# renders what is missing. The parts folder is removed once the output is joined.
+
+PARTS_DIR_SUFFIX = ".parts"
+MANIFEST_FILE_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+DEFAULT_CHECKPOINT_SECONDS = 30
+
+
+def parts_dir_for(output_path):
+    """Return the checkpoint folder used for an output file."""
+    return os.path.abspath(output_path) + PARTS_DIR_SUFFIX
+
+
+class ResumableExport(BackgroundExport):
+    """Export that checkpoints segments to disk so a restarted export resumes where it stopped."""
+
+    thread_name = "export-resumable"
+
+    def __init__(self, sorted_clips, output_path, settings, conform_workers=None, checkpoint_seconds=DEFAULT_CHECKPOINT_SECONDS,
+                 duration=None):
+        super().__init__(sorted_clips, output_path, settings)
+        self.conform_workers = conform_workers
+        self.duration = duration
+        self.extension = os.path.splitext(output_path)[1] or ".mp4"
+        self.parts_dir = parts_dir_for(output_path)
+        self.manifest_path = os.path.join(self.parts_dir, MANIFEST_FILE_NAME)
+        self.total_frames = sections_frame_total(build_render_sections(sorted_clips, settings['fps'], duration))
+        self.segment_frames = max(1, int(round(checkpoint_seconds * settings['fps'])))
+        self.resumed_segments = 0 # Segments found finished from an earlier run
+        self._current_pipeline = None
+
+    def cancel(self):
+        """Stop after discarding the segment currently rendering; finished segments are kept for a resume."""
+        super().cancel()
+        if self._current_pipeline is not None:
+            self._current_pipeline.cancel()
+
+    def timeline_key(self):
+        """Return a key for everything that affects the output, so stale checkpoints are never reused."""
+        clips = []
+        for clip_data in self.sorted_clips:
+            video_path = clip_data.get('video_path')
+            stat = os.stat(video_path) if video_path and os.path.exists(video_path) else None
+            clips.append({'clip': clip_data, 'mtime_ns': stat.st_mtime_ns if stat else None,
+                          'size': stat.st_size if stat else None})
+        key_fields = {
+            'version': MANIFEST_VERSION,
+            'clips': clips,
+            'settings': self.settings,
+            'duration': self.duration,
+            'segment_frames': self.segment_frames,
+        }
+        return hashlib.sha1(json.dumps(key_fields, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _load_manifest(self, timeline_key):
+        """Return the manifest of an earlier run of this export, or a fresh one."""
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, "r", encoding="utf-8") as manifest_file:
+                    manifest = json.load(manifest_file)
+                if manifest.get('timeline_key') == timeline_key:
+                    return manifest
+            except (OSError, ValueError):
+                pass
+            # Checkpoints of a different timeline or settings: start over
+            shutil.rmtree(self.parts_dir, ignore_errors=True)
+
+        os.makedirs(self.parts_dir, exist_ok=True)
+        segments = []
+        for index, first_frame in enumerate(range(0, self.total_frames, self.segment_frames)):
+            segments.append({'file': f"segment_{index:05d}{self.extension}", 'first_frame': first_frame,
+                             'frames': min(self.segment_frames, self.total_frames - first_frame), 'done': False})
+        manifest = {'version': MANIFEST_VERSION, 'timeline_key': timeline_key, 'segments': segments}
+        self._save_manifest(manifest)
+        return manifest
+
+    def _save_manifest(self, manifest):
+        """Write the manifest atomically."""
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+    def _export(self):
+        """Render the segments that aren't checkpointed yet, then join them all."""
+        if self.total_frames == 0:
+            raise ExportError("No valid video files found in timeline clips.")
+        require_ffmpeg("A resumable export")
+        manifest = self._load_manifest(self.timeline_key())
+        for segment in manifest['segments']:
+            segment_path = os.path.join(self.parts_dir, segment['file'])
+            if segment['done'] and os.path.exists(segment_path):
+                self.resumed_segments += 1
+                self.frames_written += segment['frames']
+                self._report_progress()
+                continue
+            if self.cancelled:
+                return
+            self._render_segment(segment, segment_path)
+            if self.cancelled:
+                return
+            segment['done'] = True
+            self._save_manifest(manifest)
+
+        segment_paths = [os.path.join(self.parts_dir, segment['file']) for segment in manifest['segments']]
+        concatenate_segments(segment_paths, self.output_path, self.settings)
+        if self.resumed_segments:
+            print(f"Resumed export: reused {self.resumed_segments} of {len(segment_paths)} checkpointed segments.")
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+
+    def _render_segment(self, segment, segment_path):
+        """Render one checkpoint segment. It only appears under its final name once complete."""
+        temp_path = os.path.join(self.parts_dir, "partial" + self.extension)
+        first_frame = segment['first_frame']
+        end_frame = first_frame + segment['frames']
+        frames_before = self.frames_written
+        pipeline = ExportPipeline(clips_in_frame_range(self.sorted_clips, first_frame, end_frame, self.settings['fps']),
+                                  temp_path, self.settings, conform_workers=self.conform_workers,
+                                  frame_range=(first_frame, end_frame))
+        self._current_pipeline = pipeline
+        try:
+            pipeline.start(lambda done, total: self._on_segment_progress(frames_before, done))
+            pipeline.wait()
+        finally:
+            self._current_pipeline = None
+        self.clip_stats.extend(pipeline.clip_stats)
+
+        if pipeline.cancelled or pipeline.error is not None:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            if pipeline.error is not None:
+                raise pipeline.error
+            return
+        os.replace(temp_path, segment_path)
+
+    def _on_segment_progress(self, frames_before, segment_frames_done):
+        """Translate per-segment pipeline progress into overall progress."""
+        self.frames_written = frames_before + segment_frames_done
+        self._report_progress()
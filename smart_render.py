@@ -0,0 +1,129 @@
+import os
+import shutil
+import tempfile
+import subprocess
+import numpy as np
+
+from export_engine import ExportError, ffmpeg_path, open_video_writer
+from media_probe import probe_stream, codec_family
+from timeline_model import clip_source_range
+
+# --- Smart Render ---
+# Clips whose source already matches the export (codec, frame size, frame rate)
+# and whose range starts on a keyframe and ends on a keyframe (or at the end of
+# the file) don't need to be decoded at all: ffmpeg copies their compressed
+# packets into the segment. Everything else goes through the normal pipeline.
+#
+# Copied packets are joined with segments the export encodes itself, so the
+# source must also have been encoded with the same stream headers (profile,
+# SPS/PPS or VOL header) as the export's writer produces; otherwise the joined
+# file decodes corrupted. The headers are compared through the extradata CRC
+# ffmpeg's framecrc muxer reports, against a short reference clip encoded with
+# the export settings. Keyframes and packet timestamps come from the project's
+# keyframe index, and the copy seeks by the keyframe's recorded timestamp, which
+# accounts for the stream's start time and edit lists.
+
+FPS_TOLERANCE = 0.01 # Frame rates closer than this are treated as equal
+KEYFRAME_SEEK_EPSILON_MS = 1.0 # Seek just past the keyframe's timestamp so rounding can't land on the previous one
+_header_signatures = {} # (video_path, size, mtime_ns) -> header signature
+_encoder_signatures = {} # (fourcc, width, height, fps, extension) -> header signature
+
+
+def stream_header_signature(video_path):
+    """Return the codec, frame size, aspect ratio and extradata of a file's video stream, as ffmpeg reports them."""
+    try:
+        stat = os.stat(video_path)
+    except OSError:
+        return None
+    key = (video_path, stat.st_size, stat.st_mtime_ns)
+    if key not in _header_signatures:
+        command = [ffmpeg_path(), "-loglevel", "error", "-i", video_path, "-map", "0:v:0", "-c", "copy",
+                   "-frames:v", "1", "-f", "framecrc", "-"]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            return None
+        # Header lines look like "#extradata 0:       40, 0xf8b70ab4" and "#codec_id 0: h264"
+        fields = ('#extradata', '#codec_id', '#dimensions', '#sar')
+        _header_signatures[key] = tuple(line.strip() for line in result.stdout.splitlines() if line.startswith(fields))
+    return _header_signatures[key]
+
+
+def encoder_header_signature(settings, extension):
+    """Return the stream header signature of what the export's writer produces for these settings, or None."""
+    key = (settings['fourcc'], settings['width'], settings['height'], settings['fps'], extension)
+    if key not in _encoder_signatures:
+        reference_dir = tempfile.mkdtemp(prefix="smart-render-")
+        try:
+            reference_path = os.path.join(reference_dir, "reference" + extension)
+            writer = open_video_writer(reference_path, settings)
+            black_frame = np.zeros((settings['height'], settings['width'], 3), np.uint8)
+            for _ in range(2):
+                writer.write(black_frame)
+            writer.release()
+            _encoder_signatures[key] = stream_header_signature(reference_path)
+        except ExportError:
+            _encoder_signatures[key] = None # The writer can't encode these settings here
+        finally:
+            shutil.rmtree(reference_dir, ignore_errors=True)
+    return _encoder_signatures[key]
+
+
+def clip_frame_range(clip_data, stream_info):
+    """Return the (first, end) source frames a clip uses, end exclusive and clamped to the file."""
+    source_in, source_out = clip_source_range(clip_data)
+    return source_in, min(source_out, stream_info['frame_count'])
+
+
+def stream_copy_eligible(clip_data, settings, keyframe_index, extension=".mp4"):
+    """Check whether a clip can be stream copied. Returns (eligible, reason)."""
+    if not ffmpeg_path():
+        return False, "ffmpeg not installed"
+
+    video_path = clip_data.get('video_path')
+    stream_info = probe_stream(video_path) if video_path else None
+    if stream_info is None:
+        return False, "cannot open source"
+    if stream_info['codec'] != codec_family(settings['fourcc']):
+        return False, f"codec {stream_info['codec']} differs from output {codec_family(settings['fourcc'])}"
+    if stream_info['width'] != settings['width'] or stream_info['height'] != settings['height']:
+        return False, "frame size differs from output"
+    if abs(stream_info['fps'] - settings['fps']) > FPS_TOLERANCE:
+        return False, "frame rate differs from output"
+
+    source_signature = stream_header_signature(video_path)
+    encoder_signature = encoder_header_signature(settings, extension)
+    if source_signature is None or encoder_signature is None or source_signature != encoder_signature:
+        return False, "stream headers (profile, extradata) differ from the export encoder's"
+
+    frame_index = keyframe_index.get_or_build(video_path)
+    if frame_index is None:
+        return False, "keyframes unknown"
+    keyframes = frame_index['keyframes']
+    first_frame, end_frame = clip_frame_range(clip_data, stream_info)
+    if first_frame not in keyframes:
+        return False, "range does not start on a keyframe"
+    if end_frame < stream_info['frame_count'] and end_frame not in keyframes:
+        return False, "range does not end on a keyframe"
+    return True, ""
+
+
+def stream_copy_clip(clip_data, output_path, settings, keyframe_index):
+    """Copy a clip's compressed video packets into output_path. Returns the number of frames copied."""
+    stream_info = probe_stream(clip_data['video_path'])
+    first_frame, end_frame = clip_frame_range(clip_data, stream_info)
+    frame_total = end_frame - first_frame
+
+    command = [ffmpeg_path(), "-y", "-loglevel", "error"]
+    if first_frame > 0:
+        # Input seeking goes to the last keyframe at or before the given time: the one the range starts with
+        frame_index = keyframe_index.get_or_build(clip_data['video_path'])
+        seek_ms = frame_index['timestamps_ms'][first_frame] + KEYFRAME_SEEK_EPSILON_MS
+        command += ["-ss", f"{seek_ms / 1000:.6f}"]
+    # The keyframe lands just before time 0; shift it to 0 so the output's edit list doesn't hide it
+    command += ["-i", clip_data['video_path'], "-map", "0:v:0", "-c", "copy", "-an", "-avoid_negative_ts", "make_zero",
+                "-frames:v", str(frame_total), output_path]
+
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0 or not os.path.exists(output_path):
+        raise ExportError(f"ffmpeg could not copy {os.path.basename(clip_data['video_path'])}: {result.stderr.strip()}")
+    return frame_total
@@ -0,0 +1,100 @@
+import json
+import os
+
+# --- Timeline Model Helpers ---
+# Qt-free helpers for the clip data dictionaries stored by the timeline scene,
+# shared by the editor GUI and the export code.
+#
+# Besides its timeline position ('start_time', 'duration'), every clip records
+# the part of its source file it uses: 'source_in' is the first source frame
+# index and 'source_out' the frame index just past the last one. Trimming and
+# splitting only move these markers; the source file itself is never touched.
+#
+# Video clips are stacked by track: 'V2' is composited over 'V1', and so on.
+# 'opacity' (0.0-1.0, default 1.0) controls how much of the layers below shows
+# through a clip.
+
+TIMELINE_FILE_VERSION = 1
+DEFAULT_OPACITY = 1.0
+
+def clip_source_range(clip_data):
+    """Return the (source_in, source_out) frame range of a clip, source_out exclusive."""
+    source_in = int(clip_data.get('source_in', 0))
+    source_out = clip_data.get('source_out')
+    if source_out is None:
+        # Clips saved before source ranges existed use the file from frame 0
+        source_out = source_in + int(clip_data.get('frame_count', 0))
+    return source_in, max(source_in, int(source_out))
+
+
+def clip_frame_total(clip_data):
+    """Return the number of source frames a clip uses."""
+    source_in, source_out = clip_source_range(clip_data)
+    return source_out - source_in
+
+
+def set_clip_source_range(clip_data, source_in, source_out):
+    """Set a clip's source range and keep its frame count in sync."""
+    clip_data['source_in'] = int(source_in)
+    clip_data['source_out'] = max(int(source_in), int(source_out))
+    clip_data['frame_count'] = clip_data['source_out'] - clip_data['source_in']
+
+
+def clip_duration(clip_data):
+    """Return how long a clip plays on the timeline, in seconds."""
+    fps = clip_data.get('fps')
+    if fps:
+        return clip_frame_total(clip_data) / fps
+    return float(clip_data.get('duration', 0))
+
+
+def timeline_duration(clips_data):
+    """Return the end time of the last clip on any track, in seconds. Gaps before it are part of the timeline."""
+    return max((clip_data.get('start_time', 0) + clip_duration(clip_data) for clip_data in clips_data), default=0.0)
+
+
+def is_video_clip(clip_data):
+    """Return True if the clip sits on a video track and contributes to the picture."""
+    return clip_data.get('track_type', 'video') == 'video'
+
+
+def clip_layer(clip_data):
+    """Return the stacking order of a clip's track: 1 for V1, 2 for V2, ... Higher layers are drawn on top."""
+    digits = ''.join(ch for ch in str(clip_data.get('track', '')) if ch.isdigit())
+    return int(digits) if digits else 1
+
+
+def clip_opacity(clip_data):
+    """Return a clip's opacity clamped to 0.0-1.0."""
+    return min(1.0, max(0.0, float(clip_data.get('opacity', DEFAULT_OPACITY))))
+
+
+def sorted_timeline_clips(clips_data):
+    """Return the clips sorted by their timeline start time."""
+    return sorted(clips_data, key=lambda x: x.get('start_time', 0))
+
+
+def save_timeline(path, clips_data):
+    """Save timeline clip data to a JSON timeline file."""
+    timeline = {'version': TIMELINE_FILE_VERSION, 'clips': [dict(clip) for clip in clips_data]}
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as timeline_file:
+        json.dump(timeline, timeline_file, indent=2)
+    os.replace(temp_path, path)
+
+
+def load_timeline(path):
+    """Load clip data from a JSON timeline file. Relative video paths are resolved against the file's folder."""
+    with open(path, "r", encoding="utf-8") as timeline_file:
+        timeline = json.load(timeline_file)
+    if timeline.get('version', 0) > TIMELINE_FILE_VERSION:
+        raise ValueError(f"Timeline file {os.path.basename(path)} was saved by a newer version of the editor.")
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    clips_data = []
+    for clip_data in timeline.get('clips', []):
+        video_path = clip_data.get('video_path')
+        if video_path and not os.path.isabs(video_path):
+            clip_data['video_path'] = os.path.join(base_dir, video_path)
+        clips_data.append(clip_data)
+    return clips_data
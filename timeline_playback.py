@@ -0,0 +1,89 @@
+import bisect
+
+from timeline_model import clip_duration, clip_layer, clip_source_range, is_video_clip, timeline_duration
+
+# --- Timeline Playback Spans ---
+# The preview plays the timeline as a run of spans: stretches of time in which
+# one clip is on top (the highest video track wins) or a gap with no clip.
+# Spans cover the timeline from 0 to its end without holes, so playback can hand
+# over from one span to the next at exact boundaries, and finding the span at a
+# time is a bisect over the span start times.
+#
+# Shortly before a span ends the preview opens the next clip and lets it decode
+# its first frames (pre-roll), so the handover at the boundary only swaps
+# decoders. Gaps play as black frames at GAP_PLAYBACK_FPS.
+
+PREROLL_SECONDS = 1.0
+GAP_PLAYBACK_FPS = 30
+
+
+class PlaybackTimeline:
+    """Spans {'start', 'end', 'clip'} of a timeline, with 'clip' None in gaps, and O(log n) lookup by time."""
+
+    def __init__(self, clips_data):
+        self.duration = timeline_duration(clips_data)
+        self.spans = build_playback_spans(clips_data, self.duration)
+        self._starts = [span['start'] for span in self.spans]
+
+    def span_index_at(self, time):
+        """Return the index of the span playing at `time`, or None past the end of the timeline."""
+        if not self.spans or time >= self.duration:
+            return None
+        return max(0, bisect.bisect_right(self._starts, time) - 1)
+
+    def span_at(self, time):
+        """Return the span playing at `time`, or None past the end of the timeline."""
+        index = self.span_index_at(time)
+        return self.spans[index] if index is not None else None
+
+    def next_span(self, span):
+        """Return the span after `span`, or None if it is the last one."""
+        index = self.span_index_at(span['start'])
+        if index is None or index + 1 >= len(self.spans):
+            return None
+        return self.spans[index + 1]
+
+
+def build_playback_spans(clips_data, duration=None):
+    """Return the spans of a timeline: the top-most video clip (or None) between consecutive clip edges."""
+    video_clips = [clip_data for clip_data in clips_data if is_video_clip(clip_data) and clip_duration(clip_data) > 0]
+    if duration is None:
+        duration = timeline_duration(clips_data)
+    edges = sorted({0.0, duration}
+                   | {clip_data.get('start_time', 0) for clip_data in video_clips}
+                   | {clip_data.get('start_time', 0) + clip_duration(clip_data) for clip_data in video_clips})
+
+    spans = []
+    for start, end in zip(edges, edges[1:]):
+        if end <= start or start >= duration:
+            continue
+        middle = (start + end) / 2
+        covering = [clip_data for clip_data in video_clips
+                    if clip_data.get('start_time', 0) <= middle < clip_data.get('start_time', 0) + clip_duration(clip_data)]
+        # Higher tracks are on top; on the same track the later clip wins
+        top_clip = max(covering, key=lambda clip_data: (clip_layer(clip_data), clip_data.get('start_time', 0)), default=None)
+        if spans and spans[-1]['clip'] is top_clip:
+            spans[-1]['end'] = end
+        else:
+            spans.append({'start': start, 'end': end, 'clip': top_clip})
+    return spans
+
+
+def span_source_frame(span, time, fps):
+    """Return the source frame of a span's clip shown at timeline `time`, clamped to the clip's source range."""
+    clip_data = span['clip']
+    source_in, source_out = clip_source_range(clip_data)
+    frame = source_in + int((time - clip_data.get('start_time', 0)) * fps + 1e-6)
+    return max(source_in, min(frame, source_out - 1))
+
+
+def span_end_source_frame(span, fps):
+    """Return the source frame at which a span hands over to the next one.
+
+    This is computed from the span's end time, not clamped to the clip's source
+    out point, so a clip whose source runs out early holds its last frame until
+    the span ends rather than cutting the timeline short.
+    """
+    clip_data = span['clip']
+    source_in = clip_source_range(clip_data)[0]
+    return max(source_in, source_in + int(round((span['end'] - clip_data.get('start_time', 0)) * fps)))
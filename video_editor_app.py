@@ -1,26 +1,47 @@
 import sys
 import os
+import subprocess
 import cv2
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QHBoxLayout, QGraphicsView, QGraphicsScene,
                              QGraphicsRectItem, QGraphicsTextItem, QAction,
                              QFileDialog, QMessageBox, QSizePolicy, QFrame,
                              QToolBar, QLabel, QSlider, QStyle, QPushButton,
-                             QScrollArea, QMenu) # Added QMenu for context menu
+                             QScrollArea, QMenu, QProgressDialog, QInputDialog, QActionGroup, QComboBox) # Added QMenu for context menu
 from PyQt5.QtGui import QColor, QBrush, QPen, QFont, QPainter, QImage, QPixmap, QIcon, QTransform, QDrag
 from PyQt5.QtCore import Qt, QRectF, QPointF, QTimer, QTime, QUrl, QMimeData, QByteArray, QDataStream, QIODevice, pyqtSignal
 
 # Import the new PyQtTimelineView component
 from pyqt_timeline import PyQtTimelineView, PyQtTimelineClip # Assuming pyqt_timeline.py is in the same directory
+from export_engine import (ExportPipeline, ParallelExport, probe_export_settings,
+                           default_conform_workers, default_segment_processes, ffmpeg_path,
+                           review_package_targets, segmented_target, SEGMENT_PLAYLIST_FILE_NAME)
+from render_cache import RenderCache, CachedExport, RENDER_CACHE_DIR_NAME
+from export_queue import ExportQueue
+from resumable_export import ResumableExport
+from encoder_probe import probe_encoders, select_fourcc, user_cache_dir, QUALITY_TIERS, DEFAULT_QUALITY
+from export_worker import ExportWorker
+from preview_decoder import PreviewDecoder, PREVIEW_RESOLUTIONS
+from preview_widget import PreviewCanvas
+from playback_clock import PlaybackClock
+from frame_cache import shared_frame_cache
+from keyframe_index import KeyframeIndex, KEYFRAME_INDEX_DIR_NAME
+from capture_pool import shared_capture_pool
+from timeline_playback import (PlaybackTimeline, span_source_frame, span_end_source_frame, PREROLL_SECONDS,
+                               GAP_PLAYBACK_FPS)
+from timeline_model import (clip_source_range, set_clip_source_range, clip_opacity, save_timeline, load_timeline)
 
 # You will need to install PyQt5: pip install PyQt5
 # You might also need to install opencv-python: pip install opencv-python
 # And Pillow: pip install Pillow
 
 class VideoEditorApp(QMainWindow):
-    def __init__(self):
+    def __init__(self, project_path=None):
         super().__init__()
-        self.project_path = os.path.dirname(os.path.abspath(__file__))
+        # Project folder (passed in by project_start.py), defaults to the application folder
+        self.project_path = project_path or os.path.dirname(os.path.abspath(__file__))
+        # Render cache and keyframe index: kept with the project, or per user rather than in the application folder
+        self.cache_path = project_path or user_cache_dir()
         self.setWindowTitle("Simple Video Editor (PyQt)")
         self.setGeometry(100, 100, 1280, 720)
         self.setMinimumSize(1100, 600)
@@ -29,17 +50,41 @@ class VideoEditorApp(QMainWindow):
         self.thumbnail_widgets = [] # Store thumbnail widgets (PyQt)
 
         # Video playback variables
-        self.current_video = None # OpenCV VideoCapture object
+        self.current_video = None # PreviewDecoder reading the previewed file ahead on its own thread
         self.current_video_path = None
+        self.current_clip_data = None # Timeline clip being previewed (None when previewing a whole file)
+        self.playback_timeline = None # PlaybackTimeline while previewing the timeline, None for a whole-file preview
+        self._timeline_spans = None # PlaybackTimeline of the timeline as edited, built on demand; None after an edit
+        self.playback_span = None # Span of playback_timeline being shown; its 'clip' is None in a gap
+        self.preroll = None # {'span', 'decoder'}: the next clip, opened and decoding ahead of the span boundary
+        self.preview_resolution_divisor = 1 # Preview frames are decoded at 1/divisor of the preview size
+        self._syncing_playhead = False # True while playback moves the playhead, so on_playhead_move doesn't seek back
         self.video_playing = False
         self.current_frame = None # QPixmap or QImage for the current frame
         self.frame_count = 0
         self.current_frame_pos = 0
         self.fps = 0
         self.video_duration = 0 # Store total video duration in seconds
-
-        # Timer for video playback
+        # Keyframe positions of imported files, indexed in the background for fast preview seeks
+        self.keyframe_index = KeyframeIndex(os.path.join(self.cache_path, KEYFRAME_INDEX_DIR_NAME))
+
+        # Export settings
+        self.export_workers = default_conform_workers() # Threads used by the export conform stage
+        self.export_processes = default_segment_processes() # Processes used by parallel segment export
+        self.export_worker = None # Background export thread
+        self.use_render_cache = True # Reuse rendered clip segments between exports (needs ffmpeg)
+        self.smart_render = True # Stream copy clips that already match the output (needs ffmpeg)
+        self.resumable_export = False # Checkpoint segments so a cancelled or crashed export can resume
+        self.export_quality = DEFAULT_QUALITY # Quality tier used to pick the fastest suitable encoder
+        self.render_cache = RenderCache(os.path.join(self.cache_path, RENDER_CACHE_DIR_NAME))
+        self.export_progress_dialog = None
+        self.export_queue_process = None # Headless render_cli process working through the export queue
+
+        # Timer for video playback. It only samples the playback clock, which decides
+        # from elapsed wall-clock time which frame is due
+        self.playback_clock = PlaybackClock()
         self.video_timer = QTimer(self)
+        self.video_timer.setTimerType(Qt.PreciseTimer)
         self.video_timer.timeout.connect(self.update_video_frame)
 
 
@@ -92,12 +137,9 @@ class VideoEditorApp(QMainWindow):
         preview_header.setFixedHeight(40) # Fixed height for header
         preview_layout.addWidget(preview_header)
 
-        # Preview area (QLabel to display frames)
-        self.preview_label = QLabel("Preview", self.preview_panel)
-        self.preview_label.setAlignment(Qt.AlignCenter)
-        self.preview_label.setStyleSheet("background-color: #000; color: #888; font-size: 20pt; font-weight: bold;")
-        self.preview_label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-        preview_layout.addWidget(self.preview_label)
+        # Preview area (paints decoded frames directly, scaled to fit)
+        self.preview_canvas = PreviewCanvas(self.preview_panel)
+        preview_layout.addWidget(self.preview_canvas)
 
         # Preview controls
         self.preview_controls = QFrame(self.preview_panel)
@@ -122,6 +164,15 @@ class VideoEditorApp(QMainWindow):
         self.time_label.setStyleSheet("color: white;")
         preview_controls_layout.addWidget(self.time_label)
 
+        # Playback resolution: lower resolutions scale frames down right after decoding, or decode proxies
+        self.preview_resolution_combo = QComboBox(self.preview_controls)
+        for label, divisor in PREVIEW_RESOLUTIONS:
+            self.preview_resolution_combo.addItem(label, divisor)
+        self.preview_resolution_combo.setToolTip("Preview resolution")
+        self.preview_resolution_combo.setStyleSheet("color: white;")
+        self.preview_resolution_combo.currentIndexChanged.connect(self.on_preview_resolution_changed)
+        preview_controls_layout.addWidget(self.preview_resolution_combo)
+
         preview_layout.addWidget(self.preview_controls)
 
         center_layout.addWidget(self.preview_panel, 2) # Stretch preview panel
@@ -134,6 +185,7 @@ class VideoEditorApp(QMainWindow):
         self.timeline_view.clipDoubleClicked.connect(self.load_clip_into_preview)
         self.timeline_view.clipRightClicked.connect(self.show_timeline_clip_context_menu) # Connect right-click signal
         self.timeline_view.selectionChanged.connect(self.on_timeline_selection_changed) # Connect selection change signal
+        self.timeline_view.clipsChanged.connect(self.on_timeline_clips_changed)
 
         center_layout.addWidget(self.timeline_view, 1) # Stretch timeline panel
 
@@ -169,10 +221,77 @@ class VideoEditorApp(QMainWindow):
         import_action.triggered.connect(self.import_video)
         file_menu.addAction(import_action)
 
+        open_timeline_action = QAction("Open Timeline...", self)
+        open_timeline_action.triggered.connect(self.open_timeline)
+        file_menu.addAction(open_timeline_action)
+
+        save_timeline_action = QAction("Save Timeline...", self)
+        save_timeline_action.triggered.connect(self.save_timeline)
+        file_menu.addAction(save_timeline_action)
+
+        file_menu.addSeparator()
+
         export_action = QAction("Export Timeline", self)
-        export_action.triggered.connect(self.export_timeline)
+        export_action.triggered.connect(lambda: self.export_timeline())
         file_menu.addAction(export_action)
 
+        export_range_action = QAction("Export In/Out Range", self)
+        export_range_action.triggered.connect(lambda: self.export_timeline(in_out_range=True))
+        file_menu.addAction(export_range_action)
+
+        export_parallel_action = QAction("Export Timeline (Parallel Segments)", self)
+        export_parallel_action.triggered.connect(lambda: self.export_timeline(parallel=True))
+        file_menu.addAction(export_parallel_action)
+
+        export_review_action = QAction("Export Review Package (Master + Proxy + Thumbnails)", self)
+        export_review_action.triggered.connect(lambda: self.export_timeline(review_package=True))
+        file_menu.addAction(export_review_action)
+
+        export_stream_action = QAction("Export Streaming Segments (Watch While Rendering)...", self)
+        export_stream_action.triggered.connect(lambda: self.export_timeline(streaming=True))
+        file_menu.addAction(export_stream_action)
+
+        queue_export_action = QAction("Add Timeline to Export Queue...", self)
+        queue_export_action.triggered.connect(self.queue_timeline_export)
+        file_menu.addAction(queue_export_action)
+
+        run_queue_action = QAction("Run Export Queue", self)
+        run_queue_action.triggered.connect(self.run_export_queue)
+        file_menu.addAction(run_queue_action)
+
+        smart_render_action = QAction("Smart Render (Stream Copy Matching Clips)", self)
+        smart_render_action.setCheckable(True)
+        smart_render_action.setChecked(self.smart_render)
+        smart_render_action.toggled.connect(lambda checked: setattr(self, 'smart_render', checked))
+        file_menu.addAction(smart_render_action)
+
+        resumable_action = QAction("Resumable Export (Checkpoint Segments)", self)
+        resumable_action.setCheckable(True)
+        resumable_action.setChecked(self.resumable_export)
+        resumable_action.toggled.connect(lambda checked: setattr(self, 'resumable_export', checked))
+        file_menu.addAction(resumable_action)
+
+        quality_menu = file_menu.addMenu("Export Quality")
+        quality_group = QActionGroup(self)
+        for tier in QUALITY_TIERS:
+            quality_action = QAction(tier.capitalize(), self, checkable=True)
+            quality_action.setChecked(tier == self.export_quality)
+            quality_action.triggered.connect(lambda checked, tier=tier: setattr(self, 'export_quality', tier))
+            quality_group.addAction(quality_action)
+            quality_menu.addAction(quality_action)
+        quality_menu.addSeparator()
+        benchmark_action = QAction("Re-run Encoder Benchmark", self)
+        benchmark_action.triggered.connect(self.rerun_encoder_benchmark)
+        quality_menu.addAction(benchmark_action)
+
+        clear_cache_action = QAction("Clear Render Cache", self)
+        clear_cache_action.triggered.connect(self.clear_render_cache)
+        file_menu.addAction(clear_cache_action)
+
+        frame_cache_action = QAction("Preview Frame Cache...", self)
+        frame_cache_action.triggered.connect(self.configure_frame_cache)
+        file_menu.addAction(frame_cache_action)
+
         file_menu.addSeparator()
 
         exit_action = QAction("Exit", self)
@@ -233,12 +352,16 @@ class VideoEditorApp(QMainWindow):
             return
 
         try:
-            # Extract the first frame of the video using OpenCV
-            cap = cv2.VideoCapture(video_path)
+            # Extract the first frame of the video using OpenCV. The handle stays open in the
+            # capture pool, so previewing or exporting the file next doesn't reopen it
+            cap = shared_capture_pool.checkout(video_path)
             if not cap.isOpened():
+                shared_capture_pool.checkin(cap)
                 QMessageBox.warning(self, "Error", f"Could not open video file: {os.path.basename(video_path)}")
                 return
 
+            if cap.get(cv2.CAP_PROP_POS_FRAMES) != 0:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
             success, frame = cap.read()
             if success:
                 # Convert to QImage and scale for thumbnail
@@ -261,7 +384,7 @@ class VideoEditorApp(QMainWindow):
             fps = cap.get(cv2.CAP_PROP_FPS)
             frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
             duration_sec = frame_count / fps if fps > 0 else 0
-            cap.release()
+            shared_capture_pool.checkin(cap)
 
             # Create a widget for the thumbnail item
             thumbnail_widget = QFrame(self.media_scroll_area_content)
@@ -309,6 +432,8 @@ class VideoEditorApp(QMainWindow):
             # Bind double click to load clip into preview
             thumbnail_widget.mouseDoubleClickEvent = lambda event: self.load_clip_into_preview(video_path)
 
+            self.keyframe_index.index_in_background(video_path)
+
 
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to process video: {os.path.basename(video_path)}\n{e}")
@@ -387,31 +512,13 @@ class VideoEditorApp(QMainWindow):
         self.stop_video()
 
         try:
-            # Open the new video file
-            cap = cv2.VideoCapture(video_path)
-            if not cap.isOpened():
+            # Open the new video file; frames are decoded ahead of the playhead on a background thread
+            decoder = self.open_preview_decoder(video_path)
+            if decoder is None:
                 QMessageBox.warning(self, "Error", f"Could not open video file: {os.path.basename(video_path)}")
                 return
-
-            # Update video playback variables
-            self.current_video = cap
-            self.current_video_path = video_path # Store current video path
-            self.frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            self.fps = cap.get(cv2.CAP_PROP_FPS)
-            self.video_duration = self.frame_count / self.fps if self.fps > 0 else 0
-            self.current_frame_pos = 0 # Start from the beginning of the loaded clip
-
-            # Update time slider and label
-            self.time_slider.setRange(0, int(self.video_duration * 1000)) # Use milliseconds for better precision
-            self.time_slider.setValue(0)
-            self.update_time_label()
-
-            # Start the video timer
-            if self.fps > 0:
-                 self.video_timer.start(int(1000 / self.fps)) # Set timer interval based on FPS
-            else:
-                 self.video_timer.start(33) # Default to ~30 FPS if fps is 0
-
+            decoder.start()
+            self.install_preview_decoder(decoder) # Start from the beginning of the loaded clip
 
             print(f"Loaded clip: {os.path.basename(video_path)} into preview.")
 
@@ -420,16 +527,80 @@ class VideoEditorApp(QMainWindow):
             self.stop_video() # Ensure cleanup if an error occurs
 
 
+    def open_preview_decoder(self, video_path):
+        """Open a preview decoder for a file, sized for the preview. Returns None if the file can't be opened."""
+        decoder = PreviewDecoder(video_path, keyframe_index=self.keyframe_index,
+                                 resolution_divisor=self.preview_resolution_divisor)
+        if not decoder.isOpened():
+            decoder.release()
+            return None
+        if decoder.decode_path != video_path:
+            self.keyframe_index.index_in_background(decoder.decode_path) # Proxies seek exactly too, once indexed
+        decoder.set_display_size(self.preview_canvas.width(), self.preview_canvas.height())
+        return decoder
+
+
+    def on_preview_resolution_changed(self, index):
+        """Reopen the preview at the selected resolution, keeping the position and play state."""
+        self.preview_resolution_divisor = self.preview_resolution_combo.itemData(index)
+        self.release_preroll() # Decoding at the old resolution
+        if self.current_video is None:
+            return
+
+        frame_position = self.current_frame_pos
+        resume_time = self.playback_clock.time_of_frame(frame_position) # Opening the new decoder doesn't hold up playback
+        decoder = self.open_preview_decoder(self.current_video_path)
+        if decoder is None:
+            return
+        decoder.start(frame_position)
+        self.current_video.release()
+        self.current_video = decoder
+        if self.video_playing:
+            self.playback_clock.start(frame_position, self.fps, resume_time)
+        else:
+            self.show_scrub_frame(frame_position)
+
+
+    def install_preview_decoder(self, decoder, start_frame=0):
+        """Make a started decoder the one the preview plays from, positioned at start_frame."""
+        self.current_video = decoder
+        self.current_video_path = decoder.video_path # Store current video path
+        self.frame_count = decoder.frame_count
+        self.fps = decoder.fps
+        self.video_duration = self.frame_count / self.fps if self.fps > 0 else 0
+        self.current_frame_pos = start_frame
+
+        # Update time slider and label
+        self.time_slider.setRange(0, int(self.video_duration * 1000)) # Use milliseconds for better precision
+        self.update_slider_position()
+        self.update_time_label()
+
+
+    def release_preroll(self):
+        """Close the pre-rolled next clip, if any."""
+        if self.preroll is not None:
+            if self.preroll['decoder'] is not None:
+                self.preroll['decoder'].release()
+            self.preroll = None
+
+
     def stop_video(self):
-        """Stops video playback and releases the video capture object."""
+        """Stops video playback and releases the preview decoder."""
+        if self.video_playing:
+            self.stop_playback_clock()
         self.video_playing = False
         self.video_timer.stop() # Stop the timer
         self.play_button.setIcon(self.style().standardIcon(QStyle.SP_MediaPlay)) # Set play icon
+        self.release_preroll()
+        self.playback_timeline = None
+        self.playback_span = None
 
-        if self.current_video is not None:
-            self.current_video.release()
+        if self.current_video is not None or self.fps > 0:
+            if self.current_video is not None:
+                self.current_video.release()
             self.current_video = None
             self.current_video_path = None # Clear current video path
+            self.current_clip_data = None
             self.frame_count = 0
             self.fps = 0
             self.video_duration = 0
@@ -439,237 +610,523 @@ class VideoEditorApp(QMainWindow):
             self.time_slider.setValue(0)
             self.update_time_label() # Update time label to 00:00 / 00:00
 
-        # Clear preview label
-        self.preview_label.clear()
-        self.preview_label.setText("Preview") # Show placeholder text
+        self.preview_canvas.show_placeholder() # Clear the preview
+
+
+    def save_timeline(self):
+        """Save the timeline to a JSON file (also used by the headless renderer, render_cli.py)."""
+        timeline_clips_data = self.timeline_view.scene.get_clips_data()
+        path, _ = QFileDialog.getSaveFileName(self, "Save Timeline", self.project_path, "Timeline files (*.json);;All files (*.*)")
+        if not path:
+            return
+        try:
+            save_timeline(path, timeline_clips_data)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to save timeline: {e}")
 
 
-    def export_timeline(self):
-        """Export the timeline as a single video."""
+    def open_timeline(self):
+        """Load a timeline saved with Save Timeline, replacing the current timeline."""
+        path, _ = QFileDialog.getOpenFileName(self, "Open Timeline", self.project_path, "Timeline files (*.json);;All files (*.*)")
+        if not path:
+            return
+        try:
+            clips_data = load_timeline(path)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to open timeline: {e}")
+            return
+
+        self.stop_video()
+        self.timeline_view.scene.load_clips_data(clips_data)
+        # Add each source file to the project bin once
+        known_paths = {widget.video_path for widget in self.thumbnail_widgets}
+        for clip_data in clips_data:
+            video_path = clip_data.get('video_path')
+            if video_path and video_path not in known_paths and os.path.exists(video_path):
+                self.add_thumbnail(video_path)
+                known_paths.add(video_path)
+
+
+    def export_timeline(self, parallel=False, review_package=False, in_out_range=False, streaming=False):
+        """Export the timeline as a single video.
+
+        parallel renders segments in separate processes; review_package also writes a
+        half-resolution proxy and JPEG thumbnails from the same decode pass;
+        in_out_range renders only the part between the timeline's in/out markers;
+        streaming writes a folder of short segments with a playlist that can be
+        played while the export is still running.
+        """
+        if self.export_worker is not None and self.export_worker.isRunning():
+            QMessageBox.information(self, "Export", "An export is already running.")
+            return
+
         timeline_clips_data = self.timeline_view.scene.get_clips_data() # Get clip data from PyQt timeline scene
         if not timeline_clips_data:
             QMessageBox.information(self, "Export", "No clips in timeline to export.")
             return
 
+        marked_range = self.timeline_view.get_in_out_range() if in_out_range else None
+        if in_out_range and marked_range is None:
+            QMessageBox.information(self, "Export", "Set an in marker (I) and/or an out marker (O) on the timeline first.")
+            return
+
         # Get output path
-        output_path, _ = QFileDialog.getSaveFileName(self, "Export Timeline", "", "MP4 files (*.mp4);;All files (*.*)")
+        if streaming:
+            output_path = QFileDialog.getExistingDirectory(self, "Export Streaming Segments To Folder")
+        else:
+            output_path, _ = QFileDialog.getSaveFileName(self, "Export Timeline", "", "MP4 files (*.mp4);;All files (*.*)")
         if not output_path:
             return
 
         # Sort clips by start time
         sorted_clips = sorted(timeline_clips_data, key=lambda x: x.get('start_time', 0))
-
+        # Gaps are exported as black, so the output is exactly as long as the timeline
+        duration = self.timeline_view.scene.get_timeline_duration()
+
+        def create_job():
+            """Choose the encoder and create the export job; runs on the export worker thread."""
+            # The first export on a machine benchmarks the encoders once; later ones read the cached result
+            # Streaming segments are always .mp4 files, whatever the folder is called
+            encoded_path = os.path.join(output_path, "segment.mp4") if streaming else output_path
+            fourcc = select_fourcc(encoded_path, self.export_quality)
+            settings = probe_export_settings(sorted_clips, fourcc=fourcc)
+            if marked_range:
+                # Only the frames in the range are decoded: the export seeks straight into the first clip
+                frame_range = (int(round(marked_range[0] * settings['fps'])), int(round(marked_range[1] * settings['fps'])))
+                return ExportPipeline(sorted_clips, output_path, settings, conform_workers=self.export_workers,
+                                      frame_range=frame_range)
+            elif streaming:
+                print(f"Streaming export: open {os.path.join(output_path, SEGMENT_PLAYLIST_FILE_NAME)} to watch it render.")
+                return ExportPipeline(sorted_clips, output_path, settings, conform_workers=self.export_workers,
+                                      targets=[segmented_target(output_path, settings)], duration=duration)
+            elif review_package:
+                return ExportPipeline(sorted_clips, output_path, settings, conform_workers=self.export_workers,
+                                      targets=review_package_targets(output_path, settings), duration=duration)
+            elif parallel:
+                return ParallelExport(sorted_clips, output_path, settings, processes=self.export_processes, duration=duration)
+            elif self.resumable_export:
+                # Exporting to the same file again picks up the checkpoints of an unfinished run
+                return ResumableExport(sorted_clips, output_path, settings, conform_workers=self.export_workers,
+                                       duration=duration)
+            elif self.use_render_cache and ffmpeg_path():
+                # Cached clip segments can only be spliced cheaply with ffmpeg's stream copy
+                return CachedExport(sorted_clips, output_path, settings, self.render_cache,
+                                    conform_workers=self.export_workers, smart_render=self.smart_render, duration=duration,
+                                    keyframe_index=self.keyframe_index)
+            else:
+                return ExportPipeline(sorted_clips, output_path, settings, conform_workers=self.export_workers,
+                                      duration=duration)
+
+        # Progress dialog with a Cancel button
+        self.export_progress_dialog = QProgressDialog("Preparing export...", "Cancel", 0, 1, self)
+        self.export_progress_dialog.setWindowTitle("Export")
+        self.export_progress_dialog.setWindowModality(Qt.WindowModal)
+        self.export_progress_dialog.setMinimumDuration(0)
+        self.export_progress_dialog.setAutoClose(False)
+        self.export_progress_dialog.setAutoReset(False)
+
+        # Run the export on a worker thread
+        self.export_worker = ExportWorker(create_job, output_path, self)
+        self.export_worker.progressChanged.connect(self.on_export_progress)
+        self.export_worker.exportFinished.connect(self.on_export_finished)
+        self.export_worker.exportFailed.connect(self.on_export_failed)
+        self.export_worker.exportCancelled.connect(self.on_export_cancelled)
+        self.export_progress_dialog.canceled.connect(self.export_worker.cancel)
+        self.export_worker.start()
+
+
+    def queue_timeline_export(self):
+        """Add a snapshot of the current timeline to the project's export queue."""
+        timeline_clips_data = self.timeline_view.scene.get_clips_data()
+        if not timeline_clips_data:
+            QMessageBox.information(self, "Export Queue", "No clips in timeline to export.")
+            return
+        output_path, _ = QFileDialog.getSaveFileName(self, "Queue Export", "", "MP4 files (*.mp4);;All files (*.*)")
+        if not output_path:
+            return
         try:
-            # Initialize video writer
-            first_valid_clip_data = None
-            for clip_data in sorted_clips:
-                clip_path = clip_data.get('video_path')
-                if clip_path and os.path.exists(clip_path):
-                     first_valid_clip_data = clip_data
-                     break
-
-            if not first_valid_clip_data:
-                 QMessageBox.critical(self, "Export Error", "No valid video files found in timeline clips.")
-                 return
-
-            first_clip_cap = cv2.VideoCapture(first_valid_clip_data['video_path'])
-            if not first_clip_cap.isOpened():
-                 QMessageBox.critical(self, "Export Error", f"Could not open the first clip for export: {os.path.basename(first_valid_clip_data['video_path'])}")
-                 return
-
-            frame_width = int(first_clip_cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            frame_height = int(first_clip_cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            fps = first_clip_cap.get(cv2.CAP_PROP_FPS)
-            first_clip_cap.release()
-
-            if fps == 0:
-                 QMessageBox.critical(self, "Export Error", "Cannot determine frame rate from the first clip.")
-                 return
-
-            # Define the codec and create VideoWriter object
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v') # Or 'XVID', 'MJPG'
-            out = cv2.VideoWriter(output_path, fourcc, fps, (frame_width, frame_height))
-
-            if not out.isOpened():
-                 QMessageBox.critical(self, "Export Error", "Could not initialize video writer. Check codec availability or file path permissions.")
-                 return
-
-            # Process each clip
-            for clip_data in sorted_clips:
-                video_path = clip_data.get('video_path')
-                if not video_path or not os.path.exists(video_path):
-                     print(f"Warning: Skipping missing clip file during export: {os.path.basename(video_path if video_path else 'N/A')}")
-                     continue
-
-                cap = cv2.VideoCapture(video_path)
-                if not cap.isOpened():
-                     print(f"Warning: Could not open clip for reading during export: {os.path.basename(video_path)}")
-                     continue
-
-                # Read and write frames from the clip
-                # In a real editor, you'd handle trimming/splitting based on clip_data start/end points
-                # For this simple export, we just concatenate the full clips in order
-                while cap.isOpened():
-                    ret, frame = cap.read()
-                    if not ret:
-                        break
-                    # Ensure frame size matches the output writer size (simple resizing for now)
-                    if frame.shape[1] != frame_width or frame.shape[0] != frame_height:
-                         frame = cv2.resize(frame, (frame_width, frame_height))
-                    out.write(frame)
-                cap.release()
-
-            out.release()
-            QMessageBox.information(self, "Export", "Timeline exported successfully!")
+            ExportQueue(self.project_path).add_job(timeline_clips_data, output_path, workers=self.export_workers)
+        except Exception as e:
+            QMessageBox.critical(self, "Export Queue", f"Failed to queue export: {e}")
 
+
+    def run_export_queue(self):
+        """Work through the export queue in a separate headless process."""
+        if self.export_queue_process is not None and self.export_queue_process.poll() is None:
+            QMessageBox.information(self, "Export Queue", "The export queue is already running.")
+            return
+        try:
+            cli_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "render_cli.py")
+            self.export_queue_process = subprocess.Popen([sys.executable, cli_path, "queue", "run", "--project", self.project_path])
         except Exception as e:
-            QMessageBox.critical(self, "Export Error", f"Failed to export timeline: {str(e)}")
+            QMessageBox.critical(self, "Export Queue", f"Failed to start the export queue: {e}")
+
+
+    def rerun_encoder_benchmark(self):
+        """Benchmark the available encoders again and show the results."""
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            results = probe_encoders(".mp4", refresh=True)
         finally:
-            if 'out' in locals() and out.isOpened():
-                 out.release()
+            QApplication.restoreOverrideCursor()
+        if not results:
+            QMessageBox.warning(self, "Encoder Benchmark", "No working encoders found for MP4 files.")
+            return
+        lines = [f"{result['fourcc']}: {result['fps']:.0f} fps, {result['psnr']:.1f} dB" for result in results]
+        lines.append(f"\nSelected for {self.export_quality} quality: {select_fourcc('output.mp4', self.export_quality)}")
+        QMessageBox.information(self, "Encoder Benchmark", "\n".join(lines))
 
 
-    def toggle_play(self):
-        """Toggle video playback."""
-        if self.current_video is None:
-            # If no video is loaded in preview, try to load the clip at the current playhead position
-            timeline_clips_data = self.timeline_view.scene.get_clips_data()
-            if timeline_clips_data:
-                playhead_x = self.timeline_view.scene.playhead_item.pos().x()
-                playhead_time = playhead_x / self.timeline_view.timeline_scale
-
-                target_clip_data = None
-                # Find the clip the playhead is currently over
-                for clip_data in sorted(timeline_clips_data, key=lambda x: x.get('start_time', 0)):
-                     clip_start_time = clip_data.get('start_time', 0)
-                     clip_duration = clip_data.get('duration', 0)
-                     if clip_start_time <= playhead_time < clip_start_time + clip_duration:
-                         target_clip_data = clip_data
-                         break
-                     elif playhead_time < clip_start_time:
-                          # Playhead is before this clip, so the previous clip (if any) or no clip is the target
-                          break # Since clips are sorted, no need to check further
-
-                # If playhead is before the first clip, load the first clip
-                if target_clip_data is None and timeline_clips_data:
-                     target_clip_data = sorted(timeline_clips_data, key=lambda x: x.get('start_time', 0))[0]
-                     # Adjust playhead to the start of the first clip if it was before it
-                     if playhead_time < target_clip_data.get('start_time', 0):
-                          self.on_playhead_move(target_clip_data.get('start_time', 0) * self.timeline_view.timeline_scale)
-
-
-                if target_clip_data and target_clip_data.get('video_path'):
-                    self.load_clip_into_preview(target_clip_data['video_path'])
-                    # Set playback position within the newly loaded clip based on timeline playhead time
-                    time_in_clip = playhead_time - target_clip_data.get('start_time', 0)
-                    if self.current_video is not None and self.fps > 0:
-                         frame_position = int(time_in_clip * self.fps)
-                         frame_position = max(0, min(frame_position, self.frame_count - 1))
-                         self.current_video.set(cv2.CAP_PROP_POS_FRAMES, frame_position)
-                         self.current_frame_pos = frame_position
-                         self.update_time_label()
-                         # Update the slider based on the position within the new clip's duration
-                         if self.video_duration > 0:
-                              slider_value = (time_in_clip / self.video_duration) * self.time_slider.maximum() # Scale to slider range (milliseconds)
-                              self.time_slider.blockSignals(True) # Block signals to prevent recursive calls
-                              self.time_slider.setValue(int(slider_value))
-                              self.time_slider.blockSignals(False) # Unblock signals
+    def clear_render_cache(self):
+        """Delete all cached rendered clip segments for this project."""
+        if self.export_worker is not None and self.export_worker.isRunning():
+            QMessageBox.information(self, "Render Cache", "Cannot clear the render cache while an export is running.")
+            return
+        self.render_cache.clear()
+        QMessageBox.information(self, "Render Cache", "Render cache cleared.")
 
 
-                else:
-                     QMessageBox.information(self, "Playback", "No valid clip found at the current playhead position.")
-                     return # Exit if no valid clip or path
+    def configure_frame_cache(self):
+        """Show the decoded-frame cache statistics and let the user change its memory budget."""
+        stats = shared_frame_cache.stats()
+        label = (f"{stats['frames']} frames cached ({stats['megabytes']:.0f} MB), "
+                 f"{stats['hits']} hits / {stats['misses']} misses ({stats['hit_rate']:.0%}).\n\nMemory budget (MB):")
+        budget_mb, ok = QInputDialog.getInt(self, "Preview Frame Cache", label, int(stats['budget_mb']), 0, 65536)
+        if ok:
+            shared_frame_cache.set_budget(budget_mb)
 
-            else:
+
+    def on_export_progress(self, frames_done, total_frames, frames_per_second, eta_seconds):
+        """Update the export progress dialog."""
+        # setValue processes events on a modal dialog, which can deliver exportFinished and close it
+        dialog = self.export_progress_dialog
+        if dialog is None:
+            return
+        eta_text = QTime(0, 0).addMSecs(int(eta_seconds * 1000)).toString('HH:mm:ss')
+        dialog.setMaximum(max(1, total_frames))
+        dialog.setLabelText(f"Exporting timeline... {frames_done} / {total_frames} frames\n"
+                            f"{frames_per_second:.1f} fps, ETA {eta_text}")
+        dialog.setValue(min(frames_done, max(1, total_frames)))
+
+
+    def on_export_finished(self, output_path):
+        """Handle a successful export."""
+        self.close_export_progress_dialog()
+        self.print_export_throughput()
+        QMessageBox.information(self, "Export", "Timeline exported successfully!")
+
+
+    def on_export_failed(self, message):
+        """Handle a failed export."""
+        self.close_export_progress_dialog()
+        QMessageBox.critical(self, "Export Error", message)
+
+
+    def on_export_cancelled(self):
+        """Handle a cancelled export."""
+        self.close_export_progress_dialog()
+        print("Export cancelled.")
+
+
+    def close_export_progress_dialog(self):
+        """Close and forget the export progress dialog."""
+        if self.export_progress_dialog is not None:
+            self.export_progress_dialog.canceled.disconnect()
+            self.export_progress_dialog.close()
+            self.export_progress_dialog = None
+
+
+    def print_export_throughput(self):
+        """Log per-clip decode throughput of the last export, slowest first, to help spot slow media."""
+        if self.export_worker is None:
+            return
+        clip_stats = getattr(self.export_worker.job, 'clip_stats', [])
+        for stats in sorted(clip_stats, key=lambda x: x['frames'] / x['seconds'] if x['seconds'] > 0 else float('inf')):
+            clip_fps = stats['frames'] / stats['seconds'] if stats['seconds'] > 0 else 0
+            print(f"Export throughput: {os.path.basename(stats['video_path'])}: {stats['frames']} frames "
+                  f"({stats.get('skipped', 0)} skipped), {clip_fps:.1f} decode fps")
+
+
+    def toggle_play(self):
+        """Toggle video playback."""
+        if not self.video_playing and (self.current_video is None or self.playback_timeline is not None):
+            # Timeline playback: spans of the timeline as it is now (rebuilt only after an edit)
+            playback_timeline = self.current_playback_timeline()
+            if not playback_timeline.spans:
                  QMessageBox.information(self, "Playback", "No clips on the timeline to play.")
                  return # Exit if no clips on timeline
 
+            playhead_time = self.timeline_view.playhead_time()
+            if playback_timeline.span_at(playhead_time) is None:
+                # At the end of the timeline: play it again from the start
+                playhead_time = 0.0
+                self._syncing_playhead = True
+                try:
+                    self.timeline_view.move_playhead_to_scene_pos(0)
+                finally:
+                    self._syncing_playhead = False
+            self.start_timeline_preview(playback_timeline, playhead_time)
 
-        # If a video is already loaded, just toggle play/pause
-        if self.current_video is not None:
+
+        # Toggle play/pause of the loaded clip (or the gap the timeline playhead is in)
+        if self.current_video is not None or self.playback_span is not None:
             self.video_playing = not self.video_playing
             if self.video_playing:
                 self.play_button.setIcon(self.style().standardIcon(QStyle.SP_MediaPause)) # Set pause icon
+                self.playback_clock.reset()
+                self.playback_clock.start(self.current_frame_pos, self.fps)
                 if not self.video_timer.isActive():
-                     if self.fps > 0:
-                          self.video_timer.start(int(1000 / self.fps))
-                     else:
-                          self.video_timer.start(33) # Default to ~30 FPS
+                     self.video_timer.start(self.playback_clock.tick_interval_ms())
             else:
                 self.play_button.setIcon(self.style().standardIcon(QStyle.SP_MediaPlay)) # Set play icon
                 self.video_timer.stop()
+                self.stop_playback_clock()
+                self.preview_canvas.set_smooth_scaling(True) # Repaint the paused frame smoothly
+
+
+    def current_playback_timeline(self):
+        """Return the PlaybackTimeline of the timeline, building it if the clips were edited since the last call."""
+        if self._timeline_spans is None:
+            self._timeline_spans = PlaybackTimeline(self.timeline_view.scene.get_clips_data())
+        return self._timeline_spans
+
+
+    def on_timeline_clips_changed(self):
+        """Drop the cached playback spans; they are rebuilt when next needed."""
+        self._timeline_spans = None
+
+
+    def start_timeline_preview(self, playback_timeline, timeline_time):
+        """Preview the timeline from timeline_time, reusing the open decoder if it already shows that clip."""
+        self.release_preroll() # Pre-rolled for spans of the previous playback timeline
+        self.playback_timeline = playback_timeline
+        self.enter_playback_span(playback_timeline.span_at(timeline_time), timeline_time)
+
+
+    def enter_playback_span(self, span, timeline_time, origin_time=None):
+        """Continue the timeline preview in `span` from timeline_time, without stopping playback.
+
+        A decoder pre-rolled for the span takes over, so crossing a clip boundary
+        is only a swap of decoders. origin_time is the monotonic time at which
+        timeline_time was due, so the playback clock carries on without drift.
+        """
+        preroll, self.preroll = self.preroll, None
+        clip_data = span['clip']
+        video_path = clip_data.get('video_path') if clip_data is not None else None
+        decoder = None
+        if preroll is not None and preroll['span'] is span:
+            decoder = preroll['decoder'] # Already open and decoding from the span's first frame
+        elif preroll is not None and preroll['decoder'] is not None:
+            preroll['decoder'].release()
+
+        if decoder is None and video_path and self.current_video is not None and self.current_video.video_path == video_path:
+            # Same file (e.g. another part of a split clip, or a seek within the clip): keep the open decoder
+            decoder, self.current_video = self.current_video, None
+            start_frame = span_source_frame(span, timeline_time, decoder.fps)
+            if not self.video_playing or abs(start_frame - self.current_frame_pos) >= 2:
+                decoder.seek(start_frame)
+        elif decoder is None and video_path and os.path.exists(video_path):
+            decoder = self.open_preview_decoder(video_path)
+            if decoder is not None:
+                decoder.start(span_source_frame(span, timeline_time, decoder.fps))
+            else:
+                print(f"Warning: Could not open {os.path.basename(video_path)} for preview; showing black instead.")
+
+        if self.current_video is not None:
+            self.current_video.release()
+            self.current_video = None
+        self.playback_span = span
+        if decoder is not None:
+            self.install_preview_decoder(decoder, span_source_frame(span, timeline_time, decoder.fps))
+            self.current_clip_data = clip_data
+            if not self.video_playing:
+                self.show_scrub_frame(self.current_frame_pos)
+        else:
+            # Gap (or a clip that can't be read): black frames, timed at GAP_PLAYBACK_FPS
+            self.current_video_path = None
+            self.current_clip_data = None
+            self.fps = GAP_PLAYBACK_FPS
+            self.video_duration = span['end'] - span['start']
+            self.frame_count = int(round(self.video_duration * self.fps))
+            self.current_frame_pos = int((timeline_time - span['start']) * self.fps)
+            self.time_slider.setRange(0, int(self.video_duration * 1000))
+            self.update_slider_position()
+            self.update_time_label()
+            self.preview_canvas.show_black()
+
+        if self.video_playing:
+            self.playback_clock.start(self.current_frame_pos, self.fps, origin_time)
+            # Sample the clock at the new span's frame rate, e.g. going from a 24 fps clip into a 60 fps one
+            self.video_timer.setInterval(self.playback_clock.tick_interval_ms())
+
+
+    def playback_span_end_frame(self):
+        """Return the frame (source frame, or gap frame) at which the current playback span ends."""
+        if self.playback_span['clip'] is None or self.current_video is None:
+            return self.frame_count
+        return span_end_source_frame(self.playback_span, self.fps)
+
+
+    def preroll_next_span(self, due_frame, span_end_frame):
+        """Open the next span's clip and let it decode its first frames once the current span is about to end."""
+        if self.preroll is not None or span_end_frame - due_frame > PREROLL_SECONDS * self.fps:
+            return
+        next_span = self.playback_timeline.next_span(self.playback_span)
+        decoder = None
+        if next_span is not None and next_span['clip'] is not None:
+            video_path = next_span['clip'].get('video_path')
+            if video_path and os.path.exists(video_path):
+                decoder = self.open_preview_decoder(video_path)
+            if decoder is not None:
+                decoder.start(span_source_frame(next_span, next_span['start'], decoder.fps))
+        # Also recorded when there is nothing to open, so this isn't retried on every tick
+        self.preroll = {'span': next_span, 'decoder': decoder}
+
+
+    def stop_playback_clock(self):
+        """Stop the playback clock and log how many frames were dropped to keep up with real time."""
+        self.playback_clock.stop()
+        clock = self.playback_clock
+        if clock.presented_frames:
+            print(f"Playback: {clock.presented_frames} frames shown, {clock.dropped_frames} dropped to keep up.")
 
 
     def update_video_frame(self):
         """Update video frame in preview and move timeline playhead."""
-        if self.current_video is not None and self.video_playing:
-            ret, frame = self.current_video.read()
-            if ret:
-                self.current_frame_pos += 1
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        if not self.video_playing:
+            return
 
-                # Convert to QImage and then QPixmap for the QLabel
-                height, width, channel = frame.shape
-                bytes_per_line = 3 * width
-                q_image = QImage(frame.data, width, height, bytes_per_line, QImage.Format_RGB888)
-                pixmap = QPixmap.fromImage(q_image)
+        if self.playback_span is not None:
+            # Timeline playback: pre-roll the next clip, then hand over to it at the span boundary
+            due_frame = self.playback_clock.due_frame()
+            span_end_frame = self.playback_span_end_frame()
+            self.preroll_next_span(due_frame, span_end_frame)
+            next_span = self.playback_timeline.next_span(self.playback_span)
+            if due_frame >= span_end_frame and next_span is not None:
+                boundary_time = self.playback_clock.time_of_frame(span_end_frame)
+                self.enter_playback_span(next_span, next_span['start'], origin_time=boundary_time)
+                self.update_video_frame() # Show the new span's first frame on this tick
+                return
+            if self.current_video is None:
+                # Gap: the black frame stays up, only the playhead moves
+                self.current_frame_pos = min(due_frame, self.frame_count)
+                self.update_time_label()
+                self.update_slider_position()
+                self.move_playhead_to_preview_position()
+                if due_frame >= span_end_frame:
+                    self.finish_playback() # Trailing gap, e.g. audio running past the last video clip
+                return
 
-                # Scale pixmap to fit the preview label while maintaining aspect ratio
-                scaled_pixmap = pixmap.scaled(self.preview_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                self.preview_label.setPixmap(scaled_pixmap)
-                self.preview_label.setAlignment(Qt.AlignCenter) # Center the image
+        if self.current_video is not None:
+            # The decoder thread has already converted and scaled the frame; this only presents it
+            self.current_video.set_display_size(self.preview_canvas.width(), self.preview_canvas.height())
+            buffered = self.current_video.read_due(self.playback_clock.due_frame())
+            if buffered is None and not self.current_video.finished:
+                return # Next frame not due yet, or the decoder is behind: keep showing the last frame
+            ret = buffered is not None
+            # A timeline clip ends at its source out point, not at the end of the file
+            if ret and self.current_clip_data is not None and buffered[0] >= clip_source_range(self.current_clip_data)[1]:
+                ret = False
+            if ret and self.playback_span is not None and buffered[0] >= self.playback_span_end_frame():
+                ret = False # Covered by a clip on a higher track from here on
+            if ret:
+                frame_index, frame = buffered
+                self.current_frame_pos = frame_index + 1
+                self.playback_clock.frame_presented(frame_index)
+                self.display_preview_frame(frame)
 
 
                 self.update_time_label()
 
-                # Update slider position based on current frame (using time in seconds)
-                if self.fps > 0:
-                    current_time_in_clip = self.current_frame_pos / self.fps
-                    if self.video_duration > 0:
-                         slider_value = (current_time_in_clip / self.video_duration) * self.time_slider.maximum() # Scale to slider range (milliseconds)
-                         self.time_slider.blockSignals(True) # Block signals to prevent recursive calls
-                         self.time_slider.setValue(int(slider_value))
-                         self.time_slider.blockSignals(False) # Unblock signals
+                # Update slider position based on current frame
+                self.update_slider_position()
 
 
                 # Move timeline playhead
-                # Calculate time in seconds within the current clip
-                time_in_current_clip = self.current_frame_pos / self.fps if self.fps > 0 else 0
+                self.move_playhead_to_preview_position()
 
-                # Find the start time of the current clip on the timeline
-                current_clip_start_time = 0
-                if self.current_video_path:
-                     timeline_clips_data = self.timeline_view.scene.get_clips_data()
-                     for clip_data in timeline_clips_data:
-                         if clip_data.get('video_path') == self.current_video_path:
-                             current_clip_start_time = clip_data.get('start_time', 0)
-                             break
 
-                # Calculate the absolute time on the timeline
-                absolute_timeline_time = current_clip_start_time + time_in_current_clip
+            elif self.playback_span is not None and self.playback_timeline.next_span(self.playback_span) is not None:
+                return # The source ran out before its span ends: hold the last frame until the handover
+            else:
+                # End of the video, or of the last clip on the timeline
+                self.finish_playback()
 
-                # Calculate the corresponding playhead position in pixels
-                playhead_pixel_pos = absolute_timeline_time * self.timeline_view.timeline_scale
-                self.timeline_view.move_playhead_to_scene_pos(playhead_pixel_pos)
 
+    def finish_playback(self):
+        """Stop playback at the end of the video or of the timeline."""
+        self.video_playing = False
+        self.video_timer.stop()
+        self.stop_playback_clock()
+        self.release_preroll()
+        self.play_button.setIcon(self.style().standardIcon(QStyle.SP_MediaPlay)) # Set play icon
+        self.preview_canvas.set_smooth_scaling(True)
 
-            else:
-                # End of video or error reading frame
-                self.video_playing = False
-                self.video_timer.stop()
-                self.play_button.setIcon(self.style().standardIcon(QStyle.SP_MediaPlay)) # Set play icon
+        # Set frame position and slider to the end of the video (or of the clip's source range)
+        if self.current_clip_data is not None:
+            self.current_frame_pos = min(clip_source_range(self.current_clip_data)[1], self.frame_count)
+        else:
+            self.current_frame_pos = self.frame_count
+        self.update_time_label()
+        self.update_slider_position()
+
+
+    def display_preview_frame(self, frame):
+        """Show a BGR frame prepared by the preview decoder; scaled fast while playing, smoothly when paused."""
+        self.preview_canvas.set_smooth_scaling(not self.video_playing)
+        self.preview_canvas.show_frame(frame)
 
-                # Set frame position and slider to the end of the video
-                self.current_frame_pos = self.frame_count
-                self.update_time_label()
-                self.time_slider.blockSignals(True)
-                self.time_slider.setValue(self.time_slider.maximum())
-                self.time_slider.blockSignals(False)
 
-                # Optionally, reset playhead to the end of the clip or move to the next clip
-                # For now, it stops at the end of the currently loaded clip.
-                # To move to the next clip, you'd need to find the next clip on the timeline
-                # and call load_clip_into_preview with its path and set the playhead position.
+    def show_scrub_frame(self, frame_position):
+        """Show the frame at frame_position while paused, from the decoded-frame cache when possible."""
+        self.current_video.set_display_size(self.preview_canvas.width(), self.preview_canvas.height())
+        frame = self.current_video.frame_at(frame_position)
+        if frame is not None:
+            self.display_preview_frame(frame)
+
+
+    def update_slider_position(self):
+        """Move the time slider to the current frame position without triggering a seek."""
+        if self.fps > 0 and self.video_duration > 0:
+            slider_value = (self.current_frame_pos / self.fps) * 1000 # Slider range is the file duration in milliseconds
+            self.time_slider.blockSignals(True) # Block signals to prevent recursive calls
+            self.time_slider.setValue(int(min(slider_value, self.time_slider.maximum())))
+            self.time_slider.blockSignals(False) # Unblock signals
+
+
+    def move_playhead_to_preview_position(self):
+        """Move the timeline playhead to the timeline time of the current preview frame."""
+        if self.fps <= 0:
+            return
+
+        if self.playback_span is not None and self.current_clip_data is None:
+            # In a gap the position counts frames from the start of the gap
+            current_clip_start_time = self.playback_span['start']
+            time_in_current_clip = self.current_frame_pos / self.fps
+        elif self.current_clip_data is not None:
+            # Frames before the clip's source in point are not on the timeline
+            source_in = clip_source_range(self.current_clip_data)[0]
+            current_clip_start_time = self.current_clip_data.get('start_time', 0)
+            time_in_current_clip = (self.current_frame_pos - source_in) / self.fps
+        else:
+            # Whole file preview: use the first timeline clip of this file, if any
+            time_in_current_clip = self.current_frame_pos / self.fps
+            current_clip_start_time = 0
+            if self.current_video_path:
+                 timeline_clips_data = self.timeline_view.scene.get_clips_data()
+                 for clip_data in timeline_clips_data:
+                     if clip_data.get('video_path') == self.current_video_path:
+                         current_clip_start_time = clip_data.get('start_time', 0)
+                         break
+
+        # Calculate the absolute time on the timeline and the corresponding playhead position in pixels
+        absolute_timeline_time = current_clip_start_time + time_in_current_clip
+        playhead_pixel_pos = absolute_timeline_time * self.timeline_view.timeline_scale
+        self._syncing_playhead = True
+        try:
+            self.timeline_view.move_playhead_to_scene_pos(playhead_pixel_pos)
+        finally:
+            self._syncing_playhead = False
 
 
     def update_time_label(self):
@@ -701,99 +1158,41 @@ class VideoEditorApp(QMainWindow):
 
             # Only update video frame if the position has changed significantly
             if abs(frame_position - self.current_frame_pos) > 1: # Check for more than 1 frame difference
-                self.current_video.set(cv2.CAP_PROP_POS_FRAMES, frame_position)
                 self.current_frame_pos = frame_position
+                if self.video_playing:
+                    self.current_video.seek(frame_position)
+                    self.playback_clock.start(frame_position)
+                else:
+                    self.show_scrub_frame(frame_position)
                 self.update_time_label()
 
                 # Move timeline playhead based on slider change within the current clip
-                time_in_current_clip = self.current_frame_pos / self.fps if self.fps > 0 else 0
-                current_clip_start_time = 0
-                if self.current_video_path:
-                     timeline_clips_data = self.timeline_view.scene.get_clips_data()
-                     for clip_data in timeline_clips_data:
-                         if clip_data.get('video_path') == self.current_video_path:
-                             current_clip_start_time = clip_data.get('start_time', 0)
-                             break
-
-                absolute_timeline_time = current_clip_start_time + time_in_current_clip
-                playhead_pixel_pos = absolute_timeline_time * self.timeline_view.timeline_scale
-                self.timeline_view.move_playhead_to_scene_pos(playhead_pixel_pos)
+                self.move_playhead_to_preview_position()
 
 
     def on_playhead_move(self, x_pos):
         """Handle playhead movement in timeline (triggered by timeline view)."""
+        if self._syncing_playhead:
+            return # The preview itself moved the playhead
+
         # Convert playhead pixel position to time in seconds
         timeline_time_in_seconds = x_pos / self.timeline_view.timeline_scale
 
-        # Find which clip on the timeline corresponds to this time
-        target_clip_data = None
-        clip_start_time = 0
-
-        timeline_clips_data = self.timeline_view.scene.get_clips_data()
-        # Sort clips by start time to make this efficient
-        sorted_clips = sorted(timeline_clips_data, key=lambda x: x.get('start_time', 0))
-
-        for clip_data in sorted_clips:
-             clip_start_time = clip_data.get('start_time', 0)
-             clip_duration = clip_data.get('duration', 0)
-             # Check if the timeline time falls within this clip's duration (with a small tolerance)
-             if clip_start_time <= timeline_time_in_seconds < clip_start_time + clip_duration + 0.001: # Add tolerance
-                 target_clip_data = clip_data
-                 break # Found the clip
+        # Find the span of the timeline (top-most clip, or a gap) at this time
+        playback_timeline = self.current_playback_timeline()
+        target_span = playback_timeline.span_at(timeline_time_in_seconds)
 
-        if target_clip_data:
-            # Calculate the time position within the target clip
-            time_in_target_clip = timeline_time_in_seconds - clip_start_time
-
-            # If the playhead moved to a different clip than the one currently in preview
-            if self.current_video_path != target_clip_data.get('video_path'):
+        if target_span is not None:
+            target_clip_data = target_span['clip']
+            if target_clip_data is not None and self.current_video_path != target_clip_data.get('video_path'):
                 print(f"Playhead moved to a new clip: {os.path.basename(target_clip_data.get('video_path', 'N/A'))}")
-                # Load the new clip into the preview
-                video_path = target_clip_data.get('video_path')
-                if video_path:
-                    self.load_clip_into_preview(video_path)
-                    # Set the frame position within the newly loaded clip
-                    if self.current_video is not None and self.fps > 0:
-                        frame_position = int(time_in_target_clip * self.fps)
-                        # Ensure frame position is within bounds of the new clip
-                        frame_position = max(0, min(frame_position, self.frame_count - 1))
-                        self.current_video.set(cv2.CAP_PROP_POS_FRAMES, frame_position)
-                        self.current_frame_pos = frame_position
-                        self.update_time_label()
-                        # Update the slider based on the position within the new clip's duration
-                        if self.video_duration > 0:
-                             slider_value = (time_in_target_clip / self.video_duration) * self.time_slider.maximum()
-                             self.time_slider.blockSignals(True)
-                             self.time_slider.setValue(int(slider_value))
-                             self.time_slider.blockSignals(False)
-
-
-            # If the playhead is still within the same clip that's in preview
-            elif self.current_video is not None and self.fps > 0:
-                 # Update the frame position in the current video
-                 time_in_current_clip = timeline_time_in_seconds - clip_start_time # Recalculate based on current playhead position
-                 frame_position = int(time_in_current_clip * self.fps)
-                 # Ensure frame position is within bounds
-                 frame_position = max(0, min(frame_position, self.frame_count - 1))
-
-                 # Only update video frame if the position has changed significantly
-                 if abs(frame_position - self.current_frame_pos) > 1: # Check for more than 1 frame difference
-                     self.current_video.set(cv2.CAP_PROP_POS_FRAMES, frame_position)
-                     self.current_frame_pos = frame_position
-                     self.update_time_label()
-                     # Update the slider based on the position within the current clip's duration
-                     if self.video_duration > 0:
-                         slider_value = (time_in_current_clip / self.video_duration) * self.time_slider.maximum()
-                         self.time_slider.blockSignals(True)
-                         self.time_slider.setValue(int(slider_value))
-                         self.time_slider.blockSignals(False)
+            # Reuses the open decoder when the playhead stays within the same file (e.g. another part of a split clip)
+            self.start_timeline_preview(playback_timeline, timeline_time_in_seconds)
 
         else:
             # Playhead is not over any clip. Stop playback and clear preview.
             self.stop_video()
-            # Clear preview label
-            self.preview_label.clear()
-            self.preview_label.setText("Preview") # Show placeholder text
+            self.preview_canvas.show_placeholder() # Clear the preview
             self.time_label.setText("00:00 / 00:00")
             self.time_slider.setRange(0, 0)
             self.time_slider.setValue(0)
@@ -805,6 +1204,7 @@ class VideoEditorApp(QMainWindow):
         split_action = menu.addAction("Split at Playhead")
         trim_start_action = menu.addAction("Trim Start to Playhead")
         trim_end_action = menu.addAction("Trim End to Playhead")
+        opacity_action = menu.addAction("Set Opacity...")
         menu.addSeparator()
         delete_action = menu.addAction("Delete Clip")
 
@@ -812,6 +1212,7 @@ class VideoEditorApp(QMainWindow):
         split_action.triggered.connect(lambda: self.split_timeline_clip(clip_item))
         trim_start_action.triggered.connect(lambda: self.trim_timeline_clip_start(clip_item))
         trim_end_action.triggered.connect(lambda: self.trim_timeline_clip_end(clip_item))
+        opacity_action.triggered.connect(lambda: self.set_timeline_clip_opacity(clip_item))
         delete_action.triggered.connect(lambda: self.delete_timeline_clip(clip_item))
 
         # Show the menu at the global position of the mouse event
@@ -839,17 +1240,23 @@ class VideoEditorApp(QMainWindow):
 
         time_in_clip = playhead_time - clip_start_time
 
-        # Calculate new durations and frame counts
-        first_part_duration = time_in_clip
-        second_part_duration = clip_duration - time_in_clip
-
-        first_part_frames = int(first_part_duration * clip_fps) if clip_fps > 0 else 0
-        second_part_frames = clip_item.clip_data.get('frame_count', 0) - first_part_frames
+        # Split on a whole source frame; the durations and the second part's start follow from it,
+        # so the second part begins exactly where the first one ends
+        first_part_frames = int(time_in_clip * clip_fps) if clip_fps > 0 else 0
+        source_in, source_out = clip_source_range(clip_item.clip_data)
+        split_frame = min(source_in + first_part_frames, source_out) # Source frame where the second part starts
+        if clip_fps > 0:
+            first_part_duration = (split_frame - source_in) / clip_fps
+            second_part_duration = (source_out - split_frame) / clip_fps
+        else:
+            first_part_duration = time_in_clip
+            second_part_duration = clip_duration - time_in_clip
+        second_part_start_time = clip_start_time + first_part_duration
 
 
         # Update the first part (the original clip item)
         clip_item.clip_data['duration'] = first_part_duration
-        clip_item.clip_data['frame_count'] = first_part_frames
+        set_clip_source_range(clip_item.clip_data, source_in, split_frame)
         # Update visual width
         new_width = max(50, int(first_part_duration * timeline_scale))
         clip_item.setRect(clip_item.rect().x(), clip_item.rect().y(), new_width, clip_item.rect().height())
@@ -858,14 +1265,14 @@ class VideoEditorApp(QMainWindow):
         # Create data for the second part (new clip)
         second_part_data = clip_item.clip_data.copy() # Copy existing data
         second_part_data['duration'] = second_part_duration
-        second_part_data['frame_count'] = second_part_frames
-        second_part_data['start_time'] = playhead_time # New start time is playhead time
+        set_clip_source_range(second_part_data, split_frame, source_out)
+        second_part_data['start_time'] = second_part_start_time
         second_part_data['filename'] = os.path.basename(second_part_data.get('video_path', 'Unknown')) + " (2)" # Rename
 
 
-        # Add the second part as a new clip item
-        # Position the new clip at the playhead's x position and the same track y
-        new_clip_item = self.timeline_view.scene.add_clip(second_part_data, playhead_x, clip_item.pos().y())
+        # Add the second part as a new clip item, right after the first part on the same track
+        new_clip_item = self.timeline_view.scene.add_clip(second_part_data, second_part_start_time * timeline_scale,
+                                                          clip_item.sceneBoundingRect().center().y())
 
         # Deselect all and select the two new parts (original updated and new)
         self.timeline_view.scene.clearSelection()
@@ -898,24 +1305,31 @@ class VideoEditorApp(QMainWindow):
 
         time_to_trim = playhead_time - clip_start_time
 
-        # Calculate new duration and frame count
-        new_duration = clip_duration - time_to_trim
+        # Trim whole source frames; the new start time follows from them, so the remaining frames stay in place
         trimmed_frames = int(time_to_trim * clip_fps) if clip_fps > 0 else 0
-        new_frame_count = clip_item.clip_data.get('frame_count', 0) - trimmed_frames
+        source_in, source_out = clip_source_range(clip_item.clip_data)
+        new_source_in = min(source_in + trimmed_frames, source_out)
+        if clip_fps > 0:
+            new_start_time = clip_start_time + (new_source_in - source_in) / clip_fps
+            new_duration = (source_out - new_source_in) / clip_fps
+        else:
+            new_start_time = playhead_time
+            new_duration = clip_duration - time_to_trim
 
         # Update the clip data
-        clip_item.clip_data['start_time'] = playhead_time # New start time is playhead time
+        clip_item.clip_data['start_time'] = new_start_time
         clip_item.clip_data['duration'] = new_duration
-        clip_item.clip_data['frame_count'] = new_frame_count
+        set_clip_source_range(clip_item.clip_data, new_source_in, source_out)
 
         # Update visual representation (position and width)
         new_width = max(50, int(new_duration * timeline_scale))
-        clip_item.setPos(playhead_x, clip_item.pos().y()) # New position is playhead x
-        clip_item.setRect(0, 0, new_width, clip_item.rect().height()) # Rect relative to item's new position
+        clip_item.setPos(new_start_time * timeline_scale, clip_item.pos().y())
+        clip_item.setRect(0, clip_item.rect().y(), new_width, clip_item.rect().height()) # Keep the track: its y is in the rect
         clip_item.text_item.setTextWidth(new_width - 10) # Update text wrap
 
         # Update scene rectangle
         self.timeline_view.scene.update_scene_rect()
+        self.timeline_view.scene.clipsChanged.emit()
 
 
     def trim_timeline_clip_end(self, clip_item):
@@ -939,21 +1353,19 @@ class VideoEditorApp(QMainWindow):
 
         time_to_trim = (clip_start_time + clip_duration) - playhead_time
 
-        # Calculate new duration and frame count
-        new_duration = clip_duration - time_to_trim
-        trimmed_frames = int(time_to_trim * clip_fps) if clip_fps > 0 else 0
-        new_frame_count = clip_item.clip_data.get('frame_count', 0) - trimmed_frames # This might not be accurate for trimming end
-
-        # Recalculate frame count based on new duration and original start frame
-        # This requires knowing the original start frame index of the clip, which is not stored.
-        # For simplicity, let's just update the duration and visual width for now.
-        # A more robust implementation would track original start frame index.
-        new_frame_count = int(new_duration * clip_fps) if clip_fps > 0 else 0
+        # Keep whole source frames, counted from the clip's first source frame; the duration follows from them
+        kept_frames = int((playhead_time - clip_start_time) * clip_fps) if clip_fps > 0 else 0
+        source_in, source_out = clip_source_range(clip_item.clip_data)
+        new_source_out = min(source_in + kept_frames, source_out)
+        if clip_fps > 0:
+            new_duration = (new_source_out - source_in) / clip_fps
+        else:
+            new_duration = clip_duration - time_to_trim
 
 
         # Update the clip data
         clip_item.clip_data['duration'] = new_duration
-        clip_item.clip_data['frame_count'] = new_frame_count # Update frame count based on new duration
+        set_clip_source_range(clip_item.clip_data, source_in, new_source_out)
 
 
         # Update visual representation (width)
@@ -965,6 +1377,16 @@ class VideoEditorApp(QMainWindow):
 
         # Update scene rectangle
         self.timeline_view.scene.update_scene_rect()
+        self.timeline_view.scene.clipsChanged.emit()
+
+
+    def set_timeline_clip_opacity(self, clip_item):
+        """Ask for a clip's opacity, used when it is composited over lower video tracks."""
+        current_percent = int(round(clip_opacity(clip_item.clip_data) * 100))
+        percent, ok = QInputDialog.getInt(self, "Clip Opacity", "Opacity (%):", current_percent, 0, 100)
+        if ok:
+            clip_item.clip_data['opacity'] = percent / 100.0
+            self.timeline_view.scene.clipsChanged.emit()
 
 
     def delete_timeline_clip(self, clip_item):
@@ -980,6 +1402,7 @@ class VideoEditorApp(QMainWindow):
 
             # Update the scene rectangle after deletion
             self.timeline_view.scene.update_scene_rect()
+            self.timeline_view.scene.clipsChanged.emit()
 
             # Emit selection changed signal as selected items are deleted
             self.timeline_view.scene.selectionChanged.emit() # Emit from the scene
@@ -1035,6 +1458,7 @@ if __name__ == "__main__":
     app.setPalette(palette)
 
 
-    mainWin = VideoEditorApp()
+    # project_start.py passes the project folder as the first argument
+    mainWin = VideoEditorApp(sys.argv[1] if len(sys.argv) > 1 else None)
     mainWin.show()
     sys.exit(app.exec_())